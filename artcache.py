@@ -0,0 +1,97 @@
+import os
+import time
+import hashlib
+import threading
+
+import db
+from pipeline import SingleFlight
+from metrics import Metrics
+
+#Content addressed cover art cache with size bounded LRU eviction
+#Concurrent requests for the same URL (tracks of one release) share one download
+class ArtCache:
+
+    def __init__(self, path: str, max_size = 512 * 1024 * 1024, metrics = None):
+        self.path = path
+        self.max_size = max_size
+        #Hits and misses are counted as art_cache_hits and art_cache_misses
+        self.metrics = metrics if metrics != None else Metrics()
+        os.makedirs(path, exist_ok=True)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._db = db.connect(os.path.join(path, 'index.db'))
+        self._db.execute('CREATE TABLE IF NOT EXISTS art (url TEXT PRIMARY KEY, hash TEXT, size INTEGER, accessed REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS art_accessed ON art (accessed)')
+        self._db.commit()
+        self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT hash, size FROM art)').fetchone()[0]
+
+    def _file(self, hash: str) -> str:
+        return os.path.join(self.path, hash[:2], hash)
+
+    #Get image for URL, download(url) -> bytes is called on miss
+    def get(self, url: str, download) -> bytes:
+        data = self._load(url)
+        if data != None:
+            self.metrics.inc('art_cache_hits')
+            return data
+        return self._flight.do(url, lambda: self._fetch(url, download))
+
+    def _load(self, url: str):
+        with self._lock:
+            row = self._db.execute('SELECT hash FROM art WHERE url = ?', (url,)).fetchone()
+            if row == None:
+                return None
+            self._db.execute('UPDATE art SET accessed = ? WHERE url = ?', (time.time(), url))
+            self._db.commit()
+        try:
+            with open(self._file(row[0]), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _fetch(self, url: str, download) -> bytes:
+        #Could be stored while waiting for lock
+        data = self._load(url)
+        if data != None:
+            self.metrics.inc('art_cache_hits')
+            return data
+        self.metrics.inc('art_cache_misses')
+        data = download(url)
+        self._store(url, data)
+        return data
+
+    def _store(self, url: str, data: bytes):
+        hash = hashlib.sha1(data).hexdigest()
+        file = self._file(hash)
+        with self._lock:
+            #Same image can be under multiple URLs
+            if self._db.execute('SELECT 1 FROM art WHERE hash = ?', (hash,)).fetchone() == None:
+                os.makedirs(os.path.dirname(file), exist_ok=True)
+                #Other processes can be writing the same file
+                tmp = f'{file}.{os.getpid()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, file)
+                self._size += len(data)
+            self._db.execute('INSERT OR REPLACE INTO art VALUES (?, ?, ?, ?)', (url, hash, len(data), time.time()))
+            if self._size > self.max_size:
+                self._evict()
+            self._db.commit()
+
+    #Remove least recently used images until under 90% of max size
+    def _evict(self):
+        target = int(self.max_size * 0.9)
+        for url, hash, size in self._db.execute('SELECT url, hash, size FROM art ORDER BY accessed').fetchall():
+            if self._size <= target:
+                break
+            self._db.execute('DELETE FROM art WHERE url = ?', (url,))
+            if self._db.execute('SELECT 1 FROM art WHERE hash = ?', (hash,)).fetchone() == None:
+                try:
+                    os.remove(self._file(hash))
+                except OSError:
+                    pass
+                self._size -= size
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -2,25 +2,203 @@ import requests
 import json
 import re
 import datetime
+import asyncio
+import time
 
-from fuzzywuzzy import fuzz
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
+import normalize
+import scoring
+from pipeline import SingleFlight, LRU
+from metrics import Metrics
+from strategies import Strategies
+
+SEARCH_URL = 'https://www.beatport.com/search/tracks'
+RELEASE_URL = 'https://www.beatport.com/release'
+#Recent results kept in memory, older ones come from the persistent cache
+MATCHES_SIZE = 4096
+RELEASES_SIZE = 64
+PLAYABLES = 'window.Playables = '
+_json_decoder = json.JSONDecoder()
+
+#Network or HTTP error, status 0 = no response
+class RequestError(Exception):
+
+    def __init__(self, message: str, status: int = 0):
+        super().__init__(message)
+        self.status = status
+
+    #Worth retrying later
+    def temporary(self) -> bool:
+        return self.status == 0 or self.status == 429 or self.status >= 500
+
+#Parse Retry-After header in seconds
+def _retry_after(headers):
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+#Read streamed response chunks, fail early when over max_bytes (None = unlimited)
+def _read_limited(chunks, length, max_bytes: int) -> bytes:
+    if max_bytes != None and length != None and int(length) > max_bytes:
+        raise ValueError(f'Download is {length} bytes, limit is {max_bytes}')
+    data = bytearray()
+    for chunk in chunks:
+        data += chunk
+        if max_bytes != None and len(data) > max_bytes:
+            raise ValueError(f'Download is over limit of {max_bytes} bytes')
+    return bytes(data)
+
+#Network calls are done by yielding (url, params) from generators,
+#so sync and async clients share the parsing & matching logic
+#Blocking local calls (cache and catalog) are yielded as functions,
+#so the async client runs them outside of the event loop
 class Beatport:
 
-    def __init__(self):
-        pass
+    def __init__(self, cache = None, catalog = None, max_connections = 16, limiter = None, timeout = 30, search_url = SEARCH_URL, metrics = None, duration_tolerance = None, strategies = None, release_url = RELEASE_URL):
+        #Optional cache.MatchCache, catalog.Catalog and ratelimit.RateLimiter
+        self.cache = cache
+        #Search queries to try, stats are only kept in memory if not given
+        self.strategies = strategies if strategies != None else Strategies()
+        #Max difference in seconds between file and Beatport track length, None = not checked
+        self.duration_tolerance = duration_tolerance
+        self.metrics = metrics if metrics != None else Metrics()
+        self.search_url = search_url
+        self.release_url = release_url
+        self.catalog = catalog
+        self.limiter = limiter
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.session = self._create_session()
+        #Identical queries share one lookup and its result (counted as coalesced_lookups)
+        self._flight = SingleFlight()
+        self._matches = LRU(MATCHES_SIZE)
+        #Release id: tracks, fetched by release_tracks
+        self._releases = LRU(RELEASES_SIZE)
+
+    #Keep-alive session shared by all threads
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_connections)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _get(self, url: str, params: dict = None) -> str:
+        if self.limiter != None:
+            self.limiter.acquire()
+        start = time.monotonic()
+        status, retry_after = 0, None
+        self.metrics.inc('http_requests')
+        try:
+            r = self.session.get(url, params=params, timeout=self.timeout)
+            status, retry_after = r.status_code, _retry_after(r.headers)
+            self.metrics.inc('http_bytes', len(r.content))
+            r.raise_for_status()
+            return r.text
+        except requests.RequestException as e:
+            self.metrics.inc('http_errors')
+            raise RequestError(str(e), status) from e
+        finally:
+            latency = time.monotonic() - start
+            self.metrics.observe('http', latency)
+            if self.limiter != None:
+                self.limiter.release(latency, status, retry_after)
+
+    #Drive request generator
+    def _run(self, gen):
+        try:
+            request = next(gen)
+            while True:
+                request = gen.send(request() if callable(request) else self._get(*request))
+        except StopIteration as e:
+            return e.value
+
+    #Download binary data (cover art), streamed so max_bytes is enforced without reading more
+    def download(self, url: str, max_bytes: int = None) -> bytes:
+        self.metrics.inc('downloads')
+        try:
+            with self.metrics.time('download'):
+                with self.session.get(url, timeout=self.timeout, stream=True) as r:
+                    r.raise_for_status()
+                    data = _read_limited(r.iter_content(64 * 1024), r.headers.get('Content-Length'), max_bytes)
+            self.metrics.inc('download_bytes', len(data))
+            return data
+        except requests.RequestException as e:
+            self.metrics.inc('download_errors')
+            raise RequestError(str(e), getattr(e.response, 'status_code', 0)) from e
 
     def search_tracks(self, query: str) -> list:
-        url = 'https://www.beatport.com/search/tracks' 
+        return self._run(self._search_tracks(query))
 
-        r = requests.get(url, params={'q': query})
-        soup = BeautifulSoup(r.text, features='lxml')
+    #Search and match track
+    def match_track(self, title: str, artists: list, fuzzywuzzy_ratio = 80, duration: float = None, isrc: str = None, releases: list = None):
+        duration = self._duration(duration)
+        key = self._match_key(title, artists, fuzzywuzzy_ratio, duration)
+        hit, track = self._matches.get(key)
+        if hit:
+            self.metrics.inc('coalesced_lookups')
+            return track
+        #Waiting for the same query from another thread
+        shared = [True]
+        def lookup():
+            shared[0] = False
+            return self._run(self._match_track(title, artists, fuzzywuzzy_ratio, duration, isrc, releases))
+        track = self._flight.do(key, lookup)
+        if shared[0]:
+            self.metrics.inc('coalesced_lookups')
+        self._matches.put(key, track)
+        return track
 
-        #Get search results from JSON from script tag
-        script_data = str(soup.find('script', {'id': 'data-objects'}))
-        data_str = script_data[script_data.find('window.Playables = ')+19:script_data.find('\n', script_data.find('window.Playables = '))][:-1]
-        data = json.loads(data_str)
+    #Title is only lowercased and without Original Mix etc. (as compared by fuzzy matching),
+    #clean_title would make remixes and originals share one result
+    def _match_key(self, title: str, artists: list, fuzzywuzzy_ratio: int, duration: int = None) -> tuple:
+        return (normalize.clean_attributes(title), normalize.clean_artists(artists), fuzzywuzzy_ratio, duration)
+
+    #File length in whole seconds, only if it is used for matching (0 = unknown)
+    def _duration(self, duration: float):
+        if self.duration_tolerance == None or not duration:
+            return None
+        return int(round(duration))
+
+    #Tracks of release (BPSmall), page is fetched once
+    def release_tracks(self, release) -> list:
+        hit, tracks = self._releases.get(release.id)
+        if hit:
+            return tracks
+        return self._flight.do(('release', release.id), lambda: self._run(self._release_tracks(release)))
+
+    def _release_tracks(self, release):
+        tracks = yield from self._fetch_tracks(f'{self.release_url}/{release.slug}/{release.id}')
+        self.metrics.inc('release_pages')
+        self._releases.put(release.id, tracks)
+        return tracks
+
+    def _search_tracks(self, query: str):
+        return (yield from self._fetch_tracks(self.search_url, {'q': query}))
+
+    #Search and release pages have the same tracks JSON
+    def _fetch_tracks(self, url: str, params: dict = None):
+        html = yield (url, params)
+        with self.metrics.time('parse'):
+            tracks = self._parse_tracks(html)
+        if self.catalog != None:
+            yield lambda: self._catalog_add(tracks)
+        return tracks
+
+    def _catalog_add(self, tracks: list):
+        with self.metrics.time('catalog'):
+            self.catalog.add([t.serialize() for t in tracks])
+
+    def _catalog_candidates(self, title: str, artists: list) -> list:
+        with self.metrics.time('catalog'):
+            return [Track(t) for t in self.catalog.candidates(title, artists)]
+
+    def _parse_tracks(self, html: str) -> list:
+        data = self._extract_playables(html)
+        if data == None:
+            data = self._extract_playables_soup(html)
 
         #Some tracks on beatport are invalid, filter them
         out = []
@@ -30,91 +208,289 @@ class Beatport:
                 out.append(track)
         return out
 
-    #Search and match track
-    def match_track(self, title: str, artists: list, fuzzywuzzy_ratio = 80):
-        query = ', '.join(artists) + f' {title}'
-        tracks = self.search_tracks(query)
+    #Find window.Playables JSON without parsing the whole page
+    def _extract_playables(self, html: str):
+        start = html.find('data-objects')
+        if start == -1:
+            return None
+        start = html.find(PLAYABLES, start)
+        if start == -1:
+            return None
+        try:
+            data, _ = _json_decoder.raw_decode(html, start + len(PLAYABLES))
+        except ValueError:
+            return None
+        return data
 
+    #Slow fallback using full DOM
+    def _extract_playables_soup(self, html: str) -> dict:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, features='lxml')
+
+        #Get search results from JSON from script tag
+        script_data = str(soup.find('script', {'id': 'data-objects'}))
+        data_str = script_data[script_data.find('window.Playables = ')+19:script_data.find('\n', script_data.find('window.Playables = '))][:-1]
+        return json.loads(data_str)
+
+    def _match_track(self, title: str, artists: list, fuzzywuzzy_ratio: int, duration: int = None, isrc: str = None, releases: list = None):
         clean_title = self._clean_title(title)
         clean_artists = self._clean_artists(artists)
 
-        fuzzy_matches = []
-        for track in tracks:
-            #Match title
-            if clean_title == self._clean_title(track.title):
+        #Check cache
+        if self.cache != None:
+            key = self.cache.key(normalize.clean_attributes(title), clean_artists, fuzzywuzzy_ratio, self.strategies.signature(), duration)
+            hit, payload = yield lambda: self.cache.get(key)
+            if hit:
+                if payload == None:
+                    return None
+                return Track(payload)
+
+        #Check local catalog before going online
+        track = None
+        if self.catalog != None:
+            tracks = yield lambda: self._catalog_candidates(title, artists)
+            with self.metrics.time('score'):
+                track = self._match_tracks(tracks, title, artists, clean_title, clean_artists, fuzzywuzzy_ratio, duration)
+
+        #Tracklists of releases already matched next to the file (ids), only if fetched before
+        if track == None and releases != None:
+            for release in releases:
+                _, tracks = self._releases.get(release)
+                if not tracks:
+                    continue
+                with self.metrics.time('score'):
+                    track = self._match_tracks(tracks, title, artists, clean_title, clean_artists, fuzzywuzzy_ratio, duration)
+                if track != None:
+                    self.metrics.inc('release_matches')
+                    break
+
+        #Broader queries only if the previous ones found nothing
+        if track == None:
+            for name, query in self.strategies.queries(title, artists, isrc):
+                start = time.monotonic()
+                tracks = yield from self._search_tracks(query)
+                with self.metrics.time('score'):
+                    track = self._match_tracks(tracks, title, artists, clean_title, clean_artists, fuzzywuzzy_ratio, duration)
+                self.strategies.record(name, track != None, time.monotonic() - start)
+                self.metrics.inc(f'strategy_{name}_searches')
+                if track != None:
+                    self.metrics.inc(f'strategy_{name}_matches')
+                    break
+
+        if self.cache != None:
+            payload = track.serialize() if track != None else None
+            yield lambda: self.cache.put(key, payload)
+        return track
+
+    #Find best match in search results
+    def _match_tracks(self, tracks: list, title: str, artists: list, clean_title: str, clean_artists: str, fuzzywuzzy_ratio: int, duration: int = None):
+        query_artists = [normalize.clean_artist(a) for a in artists]
+        bp_artists = [[normalize.clean_artist(a.name) for a in track.artists] for track in tracks]
+
+        #Exact title match, first one with close enough length wins
+        for track, track_artists in zip(tracks, bp_artists):
+            if clean_title == normalize.clean_title(track.title) and self._duration_ok(track, duration):
                 #Match single artists
-                bp_artists = [self._clean_artist(a.name) for a in track.artists]
-                for artist in artists:
-                    if self._clean_artist(artist) in bp_artists:
-                        return track
+                if any(a in track_artists for a in query_artists):
+                    return track
                 
                 #Match all artists
-                if clean_artists == self._clean_artists(bp_artists):
+                if clean_artists == ''.join(sorted(track_artists)):
                     return track
 
-            #No match - use fuzzywuzzy
-            fuzzy = fuzz.token_sort_ratio(self._clean_attributes(track.title), self._clean_attributes(title))
-            if fuzzy >= fuzzywuzzy_ratio:
-                #Fuzzy match all artists
-                bp_artists = ','.join([a.name for a in track.artists])
-                if fuzz.token_sort_ratio(','.join(artists), bp_artists) >= fuzzywuzzy_ratio:
-                    fuzzy_matches.append((fuzzy, track))
-                    continue
-                #Match single exact artist
-                bp_artists = [self._clean_artist(a.name) for a in track.artists]
-                for artist in artists:
-                    if self._clean_artist(artist) in bp_artists:
-                        fuzzy_matches.append((fuzzy, track))
-                        continue
-        
+        #No match - cheap prefilter, only plausible tracks are fuzzy matched
+        query_title = normalize.clean_attributes(title)
+        bp_titles = [normalize.clean_attributes(t.title) for t in tracks]
+        plausible = [i for i in range(len(tracks)) if self._plausible(tracks[i], query_title, bp_titles[i], fuzzywuzzy_ratio, duration)]
+        self.metrics.inc('prefiltered', len(tracks) - len(plausible))
+        if len(plausible) == 0:
+            return None
+        #Fuzzy match titles of plausible tracks at once
+        title_scores = dict(zip(plausible, scoring.token_sort_scores(query_title, [bp_titles[i] for i in plausible])))
+        candidates = [i for i in plausible if title_scores[i] >= fuzzywuzzy_ratio]
+        if len(candidates) == 0:
+            return None
+        #Fuzzy match all artists (query first, as titles are the other way around)
+        artist_scores = scoring.token_sort_scores(','.join(artists), [','.join([a.name for a in tracks[i].artists]) for i in candidates], query_first=True)
+
         #Get best fuzzy match
-        fuzzy_matches.sort(key=lambda i: i[0], reverse=True)
-        if len(fuzzy_matches) > 0:
-            return fuzzy_matches[0][1]
-                
+        best = None
+        for i, artist_score in zip(candidates, artist_scores):
+            #Match single exact artist
+            if artist_score >= fuzzywuzzy_ratio or any(a in bp_artists[i] for a in query_artists):
+                if best == None or title_scores[i] > title_scores[best]:
+                    best = i
+        if best != None:
+            return tracks[best]
+
+    #Title can reach the ratio and length is close enough
+    def _plausible(self, track, query_title: str, bp_title: str, fuzzywuzzy_ratio: int, duration: int = None) -> bool:
+        #Scores are rounded
+        if scoring.max_score(query_title, bp_title) < fuzzywuzzy_ratio - 0.5:
+            return False
+        return self._duration_ok(track, duration)
+
+    #Length is unknown or within tolerance
+    def _duration_ok(self, track, duration: int = None) -> bool:
+        return duration == None or not track.duration or abs(track.duration / 1000 - duration) <= self.duration_tolerance
 
     def _remove_special(self, input: str) -> str:
-        specials = '.,()[] &_"' + "'"
-        for c in specials:
-            input = input.replace(c, '')
-        return input.strip()
+        return normalize.remove_special(input)
 
     #Remove track attributes like Original mix, intro clean
     def _clean_attributes(self, title: str) -> str:
-        title = re.sub(r'\(original( (mix|remix))*\)', '', title.lower())
-        title = title.replace('(intro)', '')
-        title = title.replace('(clean)', '')
-        return title.replace('  ', '').strip()
+        return normalize.clean_attributes(title)
 
     def _clean_title(self, title: str) -> str:
-        title = re.sub(r'\(*feat[^\(\\[]*', '', title.lower())
-        title = self._clean_attributes(title)
-        #Remove mid word the
-        title = title.replace('the ', '')
-        title = self._remove_special(title)
-        #Remove Remix/Mix from end
-        title = re.sub(r'(re)*mix$', '', title).strip()
-        return title
+        return normalize.clean_title(title)
 
     def _clean_artist(self, artist: str) -> str:
-        return self._remove_special(artist.lower())
+        return normalize.clean_artist(artist)
 
     def _clean_artists(self, artists: list) -> str:
-        return ''.join(sorted([self._clean_artist(a) for a in artists]))
+        return normalize.clean_artists(artists)
+
+
+#Beatport client for asyncio, with one pooled keep-alive session
+#Same API as Beatport, but search_tracks, match_track and download return coroutines
+class AsyncBeatport(Beatport):
+
+    def __init__(self, cache = None, catalog = None, max_connections = 100, max_per_host = 16, limiter = None, timeout = 30, search_url = SEARCH_URL, metrics = None, duration_tolerance = None, strategies = None, release_url = RELEASE_URL):
+        self.max_per_host = max_per_host
+        self._in_flight = {}
+        super().__init__(cache=cache, catalog=catalog, max_connections=max_connections, limiter=limiter, timeout=timeout, search_url=search_url, metrics=metrics, duration_tolerance=duration_tolerance, strategies=strategies, release_url=release_url)
+
+    #aiohttp session has to be created inside running event loop
+    def _create_session(self):
+        return None
+
+    def _get_session(self):
+        if self.session == None:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    async def _get(self, url: str, params: dict = None) -> str:
+        import aiohttp
+        if self.limiter != None:
+            await self.limiter.acquire_async()
+        start = time.monotonic()
+        status, retry_after = 0, None
+        self.metrics.inc('http_requests')
+        try:
+            async with self._get_session().get(url, params=params) as r:
+                status, retry_after = r.status, _retry_after(r.headers)
+                body = await r.read()
+                self.metrics.inc('http_bytes', len(body))
+                r.raise_for_status()
+                return body.decode(r.get_encoding())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.metrics.inc('http_errors')
+            raise RequestError(str(e), status) from e
+        finally:
+            latency = time.monotonic() - start
+            self.metrics.observe('http', latency)
+            if self.limiter != None:
+                self.limiter.release(latency, status, retry_after)
+
+    async def _run(self, gen):
+        try:
+            request = next(gen)
+            while True:
+                if callable(request):
+                    result = await asyncio.get_running_loop().run_in_executor(None, request)
+                else:
+                    result = await self._get(*request)
+                request = gen.send(result)
+        except StopIteration as e:
+            return e.value
+
+    async def download(self, url: str, max_bytes: int = None) -> bytes:
+        import aiohttp
+        self.metrics.inc('downloads')
+        try:
+            with self.metrics.time('download'):
+                async with self._get_session().get(url) as r:
+                    r.raise_for_status()
+                    if max_bytes != None and r.content_length != None and r.content_length > max_bytes:
+                        raise ValueError(f'Download is {r.content_length} bytes, limit is {max_bytes}')
+                    data = bytearray()
+                    async for chunk in r.content.iter_chunked(64 * 1024):
+                        data += chunk
+                        if max_bytes != None and len(data) > max_bytes:
+                            raise ValueError(f'Download is over limit of {max_bytes} bytes')
+                    data = bytes(data)
+            self.metrics.inc('download_bytes', len(data))
+            return data
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.metrics.inc('download_errors')
+            raise RequestError(str(e), getattr(e, 'status', 0)) from e
+
+    async def match_track(self, title: str, artists: list, fuzzywuzzy_ratio = 80, duration: float = None, isrc: str = None, releases: list = None):
+        duration = self._duration(duration)
+        key = self._match_key(title, artists, fuzzywuzzy_ratio, duration)
+        hit, track = self._matches.get(key)
+        if hit:
+            self.metrics.inc('coalesced_lookups')
+            return track
+        task = self._in_flight.get(key)
+        if task == None:
+            task = asyncio.ensure_future(self._run(self._match_track(title, artists, fuzzywuzzy_ratio, duration, isrc, releases)))
+            task.add_done_callback(lambda t: self._match_done(key, t))
+            self._in_flight[key] = task
+        else:
+            self.metrics.inc('coalesced_lookups')
+        return await task
+
+    async def release_tracks(self, release) -> list:
+        hit, tracks = self._releases.get(release.id)
+        if hit:
+            return tracks
+        key = ('release', release.id)
+        task = self._in_flight.get(key)
+        if task == None:
+            task = asyncio.ensure_future(self._run(self._release_tracks(release)))
+            task.add_done_callback(lambda t: self._in_flight.pop(key))
+            self._in_flight[key] = task
+        return await task
+
+    def _match_done(self, key: tuple, task):
+        del self._in_flight[key]
+        if not task.cancelled() and task.exception() == None:
+            self._matches.put(key, task.result())
+
+    #Match many (title, artists) queries concurrently, failed lookups are returned as exceptions
+    async def match_tracks(self, queries: list, fuzzywuzzy_ratio = 80) -> list:
+        return await asyncio.gather(*[self.match_track(title, artists, fuzzywuzzy_ratio) for title, artists in queries], return_exceptions=True)
+
+    async def close(self):
+        if self.session != None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
 
 
 class Track:
 
+    FIELDS = ['artists', 'bpm', 'release', 'duration', 'genres', 'id', 'images', 'key', 'label', 'mix', 'exclusive', 'slug', 'name', 'title', 'date']
+
+    __slots__ = ['_data', 'artists', 'bpm', 'duration', 'id', 'key', 'mix', 'exclusive', 'slug', 'name', 'title',
+        '_album', '_genres', '_label', '_release_date', '_publish_date']
+
+    #Only fields used for matching are parsed here, most search results are discarded
     def __init__(self, data: dict):
+        self._data = data
         self.artists = [BPSmall(artist) for artist in data['artists']]
         self.bpm = data['bpm']
-        self.album = BPSmall(data['release'])
         self.duration = data['duration']['milliseconds']
-        self.genres = [BPSmall(g) for g in data['genres']]
         self.id = data['id']
-        self._art = data['images']['dynamic']['url']
         self.key = data['key']
-        self.label = BPSmall(data['label'])
         self.mix = data['mix']
         self.exclusive = data['exclusive']
         self.slug = data['slug']
@@ -125,8 +501,50 @@ class Track:
         if self.title == None or self.title == "" or self.title == " ":
             self.title = f"{data['name']} ({data['mix']})"
 
-        self.release_date = datetime.datetime.strptime(data['date']['released'], '%Y-%m-%d')
-        self.publish_date = datetime.datetime.strptime(data['date']['published'], '%Y-%m-%d')
+        self._album = None
+        self._genres = None
+        self._label = None
+        self._release_date = None
+        self._publish_date = None
+
+    #Parsed on first access
+    @property
+    def album(self):
+        if self._album == None:
+            self._album = BPSmall(self._data['release'])
+        return self._album
+
+    @property
+    def genres(self):
+        if self._genres == None:
+            self._genres = [BPSmall(g) for g in self._data['genres']]
+        return self._genres
+
+    @property
+    def label(self):
+        if self._label == None:
+            self._label = BPSmall(self._data['label'])
+        return self._label
+
+    @property
+    def release_date(self):
+        if self._release_date == None:
+            self._release_date = datetime.datetime.strptime(self._data['date']['released'], '%Y-%m-%d')
+        return self._release_date
+
+    @property
+    def publish_date(self):
+        if self._publish_date == None:
+            self._publish_date = datetime.datetime.strptime(self._data['date']['published'], '%Y-%m-%d')
+        return self._publish_date
+
+    @property
+    def _art(self):
+        return self._data['images']['dynamic']['url']
+
+    #Minimal data to recreate Track from
+    def serialize(self) -> dict:
+        return {k: self._data[k] for k in Track.FIELDS}
 
     def art(self, resolution: int):
         if '{x}' in self._art or '{w}' in self._art:
@@ -147,6 +565,8 @@ class Track:
 #Datatype for sub-types in track data
 class BPSmall:
 
+    __slots__ = ['name', 'id', 'slug']
+
     def __init__(self, data: dict):
         self.name = data['name']
         self.id = data['id']
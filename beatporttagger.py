@@ -5,18 +5,81 @@ import tagger
 import math
 import sys
 import json
+import time
 import threading
 import logging
+import multiprocessing
 
-from flask import Flask, send_from_directory, request, send_file
+from flask import Flask, send_from_directory, request, send_file, Response
 
 #Disable Flask logging
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.WARN)
 
-progress = {}
 _tagger = None
 
+#Progress of current run, tagger callbacks only mark it changed,
+#state is built when requested
+class Progress:
+
+    def __init__(self, root: str = None):
+        self.root = root
+        self.tagger = None
+        #Incremented on every change
+        self.version = 0
+        self.done = False
+        #Paths relative to root, only appended
+        self.failed = []
+        self._changed = threading.Condition()
+
+    def update(self, file = None):
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+
+    def add_failed(self, file: str):
+        with self._changed:
+            self.failed.append(os.path.relpath(file, self.root))
+            self.version += 1
+            self._changed.notify_all()
+
+    def finish(self):
+        with self._changed:
+            self.done = True
+            self.version += 1
+            self._changed.notify_all()
+
+    #Wait until version changes, returns current version
+    def wait(self, version: int, timeout: float) -> int:
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    #JSON for UI
+    def state(self) -> dict:
+        t = self.tagger
+        if t == None:
+            return {}
+        percent = 100
+        if not self.done:
+            percent = math.floor((len(t.success) + len(t.fail)) / t.total * 100) if t.total > 0 else 0
+            #Until the run ends (total is not final while scanning)
+            percent = min(percent, 99)
+        return {
+            'percent': percent,
+            'success': len(t.success),
+            'failed': len(t.fail),
+            'skipped': len(t.skipped),
+            'total': t.total,
+            'scanning': t.scanning,
+            'done': self.done
+        }
+
+_progress = Progress()
+
+#Max rate of pushed progress events, updates in between are coalesced
+EVENT_INTERVAL = 0.25
+
 #Get path to assets dir, for pyinstaller
 def assets_path():
     path = os.getcwd()
@@ -35,13 +98,11 @@ app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 def index():
     return send_from_directory(assets_path(), 'index.html')
 
+#Failed files, since = number of entries client already has
 @app.route('/failed')
 def send_failed():
-    if len(_tagger.fail) > 1:
-        prefix = os.path.commonprefix(_tagger.fail)
-        failed = [f.replace(prefix, '') for f in _tagger.fail]
-        return json.dumps(failed)
-    return json.dumps(_tagger.fail)
+    since = request.args.get('since', 0, type=int)
+    return json.dumps(_progress.failed[since:])
 
 #Browse for file
 @app.route('/browse')
@@ -61,46 +122,59 @@ def start():
         return 'Invalid path!'
 
     #Generate config
-    config = tagger.TagUpdaterConfig(
-        update_tags = [tagger.UpdatableTags[t] for t in data['tags']],
-        replace_art=data['replaceArt'],
-        art_resolution=data['artResolution'],
-        artist_separator=data['artistSeparator'],
-        fuzziness=data['fuzziness'],
-        overwrite=data['overwrite'],
-        id3v23=data['id3v23']
-    )
+    config = tagger.config_from_options(data)
+
+    #Created before responding, so UI can subscribe to events right away
+    global _progress
+    _progress = Progress(path)
 
     #Start
-    thread = threading.Thread(target=start_tagger, args=(config,path))
+    thread = threading.Thread(target=start_tagger, args=(config, path, data.get('resume', False)))
     thread.start()
 
     return ''
 
 @app.route('/progress')
 def progress_request():
-    return json.dumps(progress)
-
-#Generate JSON with progress for UI
-def _update_progress(file):
-    global progress
-    if _tagger != None and _tagger.total > 0:
-        #Percentage
-        p = (len(_tagger.success) + len(_tagger.fail)) / _tagger.total
-        percent = math.floor(p*100)
-        progress = {
-            'percent': percent,
-            'success': len(_tagger.success),
-            'failed': len(_tagger.fail)
-        }
-
-def start_tagger(config, path):
-    global progress
+    return json.dumps(_progress.state())
+
+#Server-Sent Events: progress (coalesced), new failed files and end of run
+@app.route('/events')
+def events():
+    def stream(progress):
+        version, sent = -1, 0
+        while True:
+            current = progress.wait(version, 15)
+            if current == version:
+                yield ': keepalive\n\n'
+                continue
+            version = current
+            yield f'event: progress\ndata: {json.dumps(progress.state())}\n\n'
+            failed = progress.failed[sent:]
+            if len(failed) > 0:
+                sent += len(failed)
+                yield f'event: failed\ndata: {json.dumps(failed)}\n\n'
+            if progress.done:
+                yield 'event: done\ndata: {}\n\n'
+                return
+            time.sleep(EVENT_INTERVAL)
+    return Response(stream(_progress), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+#Prometheus metrics of current run
+@app.route('/metrics')
+def metrics_request():
+    text = _tagger.metrics.prometheus() if _tagger != None else ''
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+def start_tagger(config, path, resume = False):
     global _tagger
-    #Reset progress
-    progress = {}
-    _tagger = tagger.TagUpdater(config, success_callback=_update_progress, fail_callback=_update_progress)
-    _tagger.tag_dir(path)
+    progress = _progress
+    try:
+        _tagger = tagger.TagUpdater(config, success_callback=progress.update, fail_callback=progress.add_failed)
+        progress.tagger = _tagger
+        _tagger.tag_dir(path, resume=resume)
+    finally:
+        progress.finish()
 
 def start_flask():
     cli = sys.modules['flask.cli']
@@ -108,6 +182,8 @@ def start_flask():
     app.run(host='127.0.0.1', port=36958)
 
 if __name__ == '__main__':
+    #Worker processes of frozen binary
+    multiprocessing.freeze_support()
     #Flask
     thread = threading.Thread(target=start_flask)
     thread.daemon = True
@@ -118,8 +194,8 @@ if __name__ == '__main__':
         'http://localhost:36958/',
         resizable=False,
         width=400,
-        height=725,
-        min_size=(400, 725),
+        height=755,
+        min_size=(400, 755),
     )
     if sys.platform == 'win32':
         webview.start(debug=True, gui='cef')
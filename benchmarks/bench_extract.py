@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import beatport
+import fixtures
+
+#Compare window.Playables extraction with and without BeautifulSoup
+#Usage: python bench_extract.py [saved_page.html ...]
+
+def bench(fn, pages: list, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            fn(page)
+    return (time.perf_counter() - start) / (rounds * len(pages))
+
+def main():
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sys.argv[1:]:
+            with open(path, 'r', encoding='utf-8') as f:
+                pages.append(f.read())
+    else:
+        pages = [fixtures.random_page(i) for i in range(20)]
+
+    bp = beatport.Beatport()
+    #Both have to return the same data
+    for page in pages:
+        assert bp._extract_playables(page) == bp._extract_playables_soup(page)
+
+    rounds = 20
+    soup = bench(bp._extract_playables_soup, pages, rounds)
+    fast = bench(bp._extract_playables, pages, rounds)
+    print(f'Pages: {len(pages)}, avg size: {sum(len(p) for p in pages) // len(pages)} bytes')
+    print(f'BeautifulSoup: {soup * 1000:.3f} ms/page')
+    print(f'Fast:          {fast * 1000:.3f} ms/page')
+    print(f'Speedup:       {soup / fast:.1f}x')
+
+if __name__ == '__main__':
+    main()
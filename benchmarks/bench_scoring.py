@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fuzzywuzzy import fuzz
+
+import beatport
+import normalize
+import scoring
+import fixtures
+
+#Compare pairwise fuzzywuzzy scoring with batch scoring of search results
+#Usage: python bench_scoring.py [searches]
+#Batch scoring needs rapidfuzz and python-Levenshtein (optional, not in requirements)
+
+def pairwise(query: str, choices: list) -> list:
+    return [fuzz.token_sort_ratio(c, query) for c in choices]
+
+def bench(fn, searches: list, rounds: int) -> float:
+    start = time.perf_counter()
+    count = 0
+    for _ in range(rounds):
+        #Don't measure cached preprocessing
+        scoring._process_and_sort.cache_clear()
+        for query, choices in searches:
+            fn(query, choices)
+            count += len(choices)
+    return count / (time.perf_counter() - start)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rand = random.Random(0)
+    searches = []
+    for i in range(count):
+        tracks = [beatport.Track(fixtures.random_track(i * 100 + j, rand)) for j in range(50)]
+        query = normalize.clean_attributes(rand.choice(tracks).title)
+        searches.append((query, [normalize.clean_attributes(t.title) for t in tracks]))
+
+    #Scores have to be identical
+    for query, choices in searches:
+        assert pairwise(query, choices) == scoring.token_sort_scores(query, choices)
+
+    rounds = 5
+    before = bench(pairwise, searches, rounds)
+    after = bench(scoring.token_sort_scores, searches, rounds)
+    print(f'Batch scoring available: {scoring.BATCH}')
+    print(f'Pairwise: {before:,.0f} candidates/s')
+    print(f'Batch:    {after:,.0f} candidates/s')
+    print(f'Speedup:  {after / before:.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import sys
+import json
+
+#Compare two benchmark result files
+#Usage: python compare.py before.json after.json
+
+METRICS = [('throughput', True), ('p50_ms', False), ('p99_ms', False), ('peak_rss', False)]
+
+def load(path: str) -> dict:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def main():
+    if len(sys.argv) != 3:
+        print('Usage: python compare.py before.json after.json')
+        sys.exit(1)
+    before, after = load(sys.argv[1]), load(sys.argv[2])
+    print(f'{(before["commit"] or "unknown")[:10]} -> {(after["commit"] or "unknown")[:10]}')
+    for scenario, new in after['results'].items():
+        old = before['results'].get(scenario)
+        if old == None:
+            continue
+        for metric, higher_better in METRICS:
+            if old.get(metric) == None or new.get(metric) == None or old[metric] == 0:
+                continue
+            change = (new[metric] - old[metric]) / old[metric] * 100
+            better = (change > 0) == higher_better
+            print(f'{scenario:14} {metric:11} {old[metric]:14.2f} -> {new[metric]:14.2f}  {change:+7.1f}% {"" if abs(change) < 5 else ("better" if better else "WORSE")}')
+
+if __name__ == '__main__':
+    main()
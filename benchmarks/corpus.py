@@ -0,0 +1,63 @@
+import os
+import struct
+
+from mutagen.id3 import ID3, TIT2, TPE1, TALB
+from mutagen.flac import FLAC
+from mutagen.aiff import AIFF
+
+import fixtures
+
+#Generate tagged MP3/FLAC/AIFF files with minimal audio data
+
+FORMATS = ['mp3', 'flac', 'aiff']
+#Files per folder, like albums
+FOLDER_SIZE = 12
+
+def _mp3(path: str, title: str, artist: str, album: str):
+    #One silent MPEG-1 Layer 3 frame
+    with open(path, 'wb') as f:
+        f.write(b'\xff\xfb\x90\x00' + b'\x00' * 413)
+    tags = ID3()
+    tags.add(TIT2(text=title))
+    tags.add(TPE1(text=artist))
+    tags.add(TALB(text=album))
+    tags.save(path)
+
+def _flac(path: str, title: str, artist: str, album: str):
+    #STREAMINFO only: 44.1kHz, stereo, 16 bit, 5 minutes
+    info = (44100 << 44) | (1 << 41) | (15 << 36) | (44100 * 300)
+    streaminfo = struct.pack('>HH', 4096, 4096) + b'\x00' * 6 + info.to_bytes(8, 'big') + b'\x00' * 16
+    with open(path, 'wb') as f:
+        f.write(b'fLaC' + bytes([0x80]) + len(streaminfo).to_bytes(3, 'big') + streaminfo)
+    f = FLAC(path)
+    f['title'] = title
+    f['artist'] = artist
+    f['album'] = album
+    f.save()
+
+def _aiff(path: str, title: str, artist: str, album: str):
+    #COMM chunk with 44.1kHz as 80 bit float, empty SSND
+    comm = b'COMM' + struct.pack('>IhIh', 18, 2, 44100 * 300, 16) + bytes.fromhex('400EAC44000000000000')
+    ssnd = b'SSND' + struct.pack('>III', 8, 0, 0)
+    body = b'AIFF' + comm + ssnd
+    with open(path, 'wb') as f:
+        f.write(b'FORM' + struct.pack('>I', len(body)) + body)
+    f = AIFF(path)
+    f.add_tags()
+    f.tags.add(TIT2(text=title))
+    f.tags.add(TPE1(text=artist))
+    f.tags.add(TALB(text=album))
+    f.save()
+
+#Create library of count files, formats rotate
+def generate(path: str, count: int) -> list:
+    files = []
+    for n in range(count):
+        name, artists, mix = fixtures.library_track(n)
+        folder = os.path.join(path, f'release{n // FOLDER_SIZE}')
+        os.makedirs(folder, exist_ok=True)
+        format = FORMATS[n % len(FORMATS)]
+        file = os.path.join(folder, f'{n}.{format}')
+        {'mp3': _mp3, 'flac': _flac, 'aiff': _aiff}[format](file, f'{name} ({mix})', ', '.join(artists), f'Release {n // FOLDER_SIZE + 1}')
+        files.append(file)
+    return files
@@ -0,0 +1,74 @@
+import json
+import random
+
+#Synthetic Beatport data for benchmarks, used when no saved pages are given
+
+WORDS = ['deep', 'night', 'groove', 'sunrise', 'bass', 'motion', 'echo', 'shadow', 'pulse', 'dream', 'fire', 'tribe', 'rhythm', 'city', 'lights', 'storm', 'gravity', 'soul', 'machine', 'desert']
+MIXES = ['Original Mix', 'Extended Mix', 'Remix', 'Dub Mix', 'Radio Edit']
+GENRES = ['Tech House', 'Deep House', 'Techno (Peak Time / Driving)', 'Melodic House & Techno', 'Progressive House']
+
+def _small(name: str, id: int) -> dict:
+    return {'name': name, 'id': id, 'slug': name.lower().replace(' ', '-')}
+
+#Track JSON in the format of window.Playables
+def track_data(id: int, name: str, artists: list, mix: str = 'Original Mix', release_id: int = None, image_host: str = 'https://geo-media.beatport.com') -> dict:
+    release_id = release_id or id // 10
+    return {
+        'id': id,
+        'name': name,
+        'mix': mix,
+        'title': f'{name} ({mix})',
+        'slug': name.lower().replace(' ', '-'),
+        'artists': [_small(a, 1000 + i) for i, a in enumerate(artists)],
+        'remixers': [],
+        'bpm': 120 + id % 10,
+        'key': 'A♭ min',
+        'duration': {'milliseconds': 300000 + id % 60000, 'minutes': '5:00'},
+        'date': {'released': '2020-06-12', 'published': '2020-06-05'},
+        'exclusive': False,
+        'genres': [_small(GENRES[id % len(GENRES)], 10 + id % len(GENRES))],
+        'label': _small(f'Label {release_id % 50}', 5000 + release_id % 50),
+        'release': _small(f'Release {release_id}', release_id),
+        'images': {
+            'large': {'id': id, 'url': f'{image_host}/image/{release_id}.jpg'},
+            'dynamic': {'id': id, 'url': f'{image_host}/image_size/{{w}}x{{h}}/{release_id}.jpg'}
+        },
+        'preview': {'mp3': {'url': f'https://geo-samples.beatport.com/track/{id}.LOFI.mp3'}},
+        'waveform': {'large': {'url': f'https://geo-media.beatport.com/image/{id}.png'}}
+    }
+
+def random_track(id: int, rand: random.Random, **kwargs) -> dict:
+    name = ' '.join(rand.choice(WORDS).capitalize() for _ in range(rand.randint(1, 3)))
+    artists = [' '.join(rand.choice(WORDS).capitalize() for _ in range(2)) for _ in range(rand.randint(1, 2))]
+    return track_data(id, name, artists, rand.choice(MIXES), **kwargs)
+
+#Deterministic metadata of n-th file in generated library, (title, artists, mix)
+def library_track(n: int) -> tuple:
+    rand = random.Random(n)
+    name = ' '.join(rand.choice(WORDS).capitalize() for _ in range(2)) + f' {n}'
+    artists = [' '.join(rand.choice(WORDS).capitalize() for _ in range(2)) for _ in range(rand.randint(1, 2))]
+    return name, artists, rand.choice(MIXES)
+
+#HTML page similar to Beatport search results
+def search_page(tracks: list) -> str:
+    rows = ''.join(
+        f'<li class="bucket-item ec-item track" data-ec-id="{t["id"]}"><div class="buk-track-meta-parent">'
+        f'<p class="buk-track-title"><a href="/track/{t["slug"]}/{t["id"]}"><span class="buk-track-primary-title">{t["name"]}</span>'
+        f'<span class="buk-track-remixed">{t["mix"]}</span></a></p></div></li>'
+        for t in tracks
+    )
+    nav = ''.join(f'<li><a href="/genre/g/{i}">Genre {i}</a></li>' for i in range(40))
+    return (
+        '<!DOCTYPE html><html><head><title>Search :: Beatport</title>'
+        '<script type="text/javascript">window.Config = {"env": "production"};</script></head><body>'
+        f'<nav><ul>{nav}</ul></nav><main><ul class="bucket-items">{rows}</ul></main>'
+        '<script type="text/javascript" id="data-objects">\n'
+        '    window.ProductDetail = null;\n'
+        f'    window.Playables = {json.dumps({"tracks": tracks, "releases": []})};\n'
+        '    window.Sliders = [];\n'
+        '</script></body></html>'
+    )
+
+def random_page(seed: int, count: int = 25) -> str:
+    rand = random.Random(seed)
+    return search_page([random_track(seed * 100 + i, rand) for i in range(count)])
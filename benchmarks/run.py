@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+import beatport
+import tagger
+import fixtures
+import corpus
+import requests
+
+#Benchmark suite for matching and tagging hot paths, against a local Beatport stand-in
+#Every scenario runs in its own process, so peak RSS is per scenario
+#Usage: python run.py [--files 1000] [--pages saved_dir] [--output results.json]
+
+SCENARIOS = ['search_tracks', 'match_track', 'tag_file', 'tag_dir']
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[int(round(p / 100 * (len(values) - 1)))]
+
+#Peak resident memory of this process in bytes
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def result(count: int, seconds: float, latencies: list = None, **extra) -> dict:
+    out = {
+        'count': count,
+        'seconds': seconds,
+        'throughput': count / seconds if seconds > 0 else None,
+        'p50_ms': None,
+        'p99_ms': None,
+        'peak_rss': peak_rss()
+    }
+    if latencies:
+        out['p50_ms'] = percentile(latencies, 50) * 1000
+        out['p99_ms'] = percentile(latencies, 99) * 1000
+    out.update(extra)
+    return out
+
+def timed(fn, items: list) -> (float, list):
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    return time.perf_counter() - start, latencies
+
+def queries(count: int) -> list:
+    out = []
+    for n in range(count):
+        name, artists, mix = fixtures.library_track(n)
+        out.append((f'{name} ({mix})', artists))
+    return out
+
+def bench_search_tracks(args, stub: 'Stub') -> dict:
+    bp = beatport.Beatport(search_url=stub.search_url)
+    items = [', '.join(artists) + f' {title}' for title, artists in queries(args.sample)]
+    seconds, latencies = timed(bp.search_tracks, items)
+    return result(len(items), seconds, latencies)
+
+def bench_match_track(args, stub: 'Stub') -> dict:
+    bp = beatport.Beatport(search_url=stub.search_url)
+    matched = []
+    def match(query):
+        if bp.match_track(query[0], query[1]) != None:
+            matched.append(query)
+    seconds, latencies = timed(match, queries(args.sample))
+    return result(args.sample, seconds, latencies, matched=len(matched))
+
+def config(args, cache_dir: str, trace_log: str = None) -> tagger.TagUpdaterConfig:
+    return tagger.TagUpdaterConfig(
+        update_tags=list(tagger.UpdatableTags),
+        replace_art=True,
+        cache_dir=cache_dir,
+        rate_limit=args.rate_limit,
+        async_client=args.async_client,
+        release_lookup=args.release_lookup,
+        trace_log=trace_log
+    )
+
+def updater(args, stub: 'Stub', cache_dir: str, trace_log: str = None) -> tagger.TagUpdater:
+    t = tagger.TagUpdater(config(args, cache_dir, trace_log))
+    t.beatport.search_url = stub.search_url
+    t.beatport.release_url = stub.release_url
+    if t.async_beatport != None:
+        t.async_beatport.search_url = stub.search_url
+        t.async_beatport.release_url = stub.release_url
+    return t
+
+def bench_tag_file(args, stub: 'Stub', path: str) -> dict:
+    files = corpus.generate(os.path.join(path, 'library'), args.sample)
+    t = updater(args, stub, os.path.join(path, 'cache'))
+    seconds, latencies = timed(t.tag_file, files)
+    return result(len(files), seconds, latencies, success=len(t.success), failed=len(t.fail))
+
+def bench_tag_dir(args, stub: 'Stub', path: str) -> dict:
+    library = os.path.join(path, 'library')
+    corpus.generate(library, args.files)
+    trace = os.path.join(path, 'trace.jsonl')
+    t = updater(args, stub, os.path.join(path, 'cache'), trace)
+    start = time.perf_counter()
+    t.tag_dir(library)
+    seconds = time.perf_counter() - start
+    t.trace_log.close()
+    return result(args.files, seconds, file_latencies(trace), success=len(t.success), failed=len(t.fail), requests=stub.requests)
+
+#Time spent on each file in tag_dir (sum of its stage timings, without waiting in queues between stages)
+def file_latencies(trace: str) -> list:
+    with open(trace, 'r', encoding='utf-8') as f:
+        return [sum(json.loads(line)['timings'].values()) for line in f]
+
+#Stub server (stub.py) running in child process
+class Stub:
+
+    def __init__(self, pages: str = None, latency: float = 0.0):
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub.py'), '--latency', str(latency)]
+        if pages != None:
+            command += ['--pages', pages]
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.url = self._process.stdout.readline().decode().strip()
+        self.search_url = self.url + '/search/tracks'
+        self.release_url = self.url + '/release'
+
+    @property
+    def requests(self) -> int:
+        return requests.get(self.url + '/stats').json()['requests']
+
+    def stop(self):
+        self._process.stdin.close()
+        self._process.wait()
+
+#Run single scenario in this process, print JSON result
+def run_scenario(args):
+    logging.disable(logging.CRITICAL)
+    stub = Stub(args.pages, args.latency)
+    path = tempfile.mkdtemp(prefix='beatporttagger-bench-')
+    try:
+        if args.scenario == 'search_tracks':
+            out = bench_search_tracks(args, stub)
+        elif args.scenario == 'match_track':
+            out = bench_match_track(args, stub)
+        elif args.scenario == 'tag_file':
+            out = bench_tag_file(args, stub, path)
+        else:
+            out = bench_tag_dir(args, stub, path)
+    finally:
+        stub.stop()
+        shutil.rmtree(path, ignore_errors=True)
+    print(json.dumps(out))
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Beatport Tagger benchmarks')
+    parser.add_argument('--scenarios', nargs='+', default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument('--files', type=int, default=1000, help='library size for tag_dir')
+    parser.add_argument('--sample', type=int, default=500, help='queries / files for per-call scenarios')
+    parser.add_argument('--pages', help='directory with saved search pages to replay')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated server latency in seconds')
+    parser.add_argument('--rate-limit', type=float, default=None)
+    parser.add_argument('--async-client', action='store_true')
+    parser.add_argument('--release-lookup', action='store_true')
+    parser.add_argument('--output', help='JSON results path')
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario != None:
+        run_scenario(args)
+        return
+
+    commit = git_commit()
+    results = {}
+    for scenario in args.scenarios:
+        command = [sys.executable, os.path.abspath(__file__), '--scenario', scenario] + sys.argv[1:]
+        output = subprocess.check_output(command).decode()
+        results[scenario] = json.loads(output.strip().splitlines()[-1])
+        r = results[scenario]
+        line = f'{scenario:14} {r["count"]:>7} in {r["seconds"]:8.2f}s  {r["throughput"]:10.1f}/s'
+        if r['p50_ms'] != None:
+            line += f'  p50 {r["p50_ms"]:8.2f}ms  p99 {r["p99_ms"]:8.2f}ms'
+        if r['peak_rss'] != None:
+            line += f'  peak RSS {r["peak_rss"] / 1024 / 1024:.0f} MB'
+        print(line)
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', f'{(commit or "unknown")[:10]}-{int(time.time())}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'time': time.time(),
+            'python': sys.version.split()[0],
+            'options': {k: v for k, v in vars(args).items() if k not in ['scenario', 'output']},
+            'results': results
+        }, f, indent=2)
+    print(f'Saved to {output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import os
+import re
+import sys
+import json
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import fixtures
+
+#Local stand-in for beatport.com search and cover art
+
+_NUMBER = re.compile(r'(\d+)\s*(\(|$)')
+
+class StubServer:
+
+    def __init__(self, pages: list = None, latency: float = 0.0, results: int = 25, art_size: int = 100 * 1024):
+        #Saved pages are replayed in order, otherwise pages are generated from query
+        self.pages = pages
+        self.latency = latency
+        self.results = results
+        self.art = os.urandom(art_size)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    @property
+    def search_url(self) -> str:
+        return self.url + '/search/tracks'
+
+    @property
+    def release_url(self) -> str:
+        return self.url + '/release'
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            #Headers and body are separate writes
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                body = stub._handle(self.path)
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handle(self, path: str) -> bytes:
+        url = urlparse(path)
+        if url.path == '/stats':
+            return json.dumps({'requests': self.requests}).encode('utf-8')
+        with self._lock:
+            self.requests += 1
+            n = self.requests
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if url.path.startswith('/release/'):
+            return self.release_page(int(url.path.split('/')[-1])).encode('utf-8')
+        if not url.path.startswith('/search'):
+            return self.art
+        if self.pages != None:
+            return self.pages[n % len(self.pages)].encode('utf-8')
+        query = parse_qs(url.query).get('q', [''])[0]
+        return self.page(query).encode('utf-8')
+
+    #Search page with the library track from query (if any) between random tracks
+    def page(self, query: str) -> str:
+        rand = random.Random(query)
+        tracks = [fixtures.random_track(1000000 + rand.randint(0, 10 ** 6), rand, image_host=self.url) for _ in range(self.results - 1)]
+        match = _NUMBER.search(query)
+        if match != None:
+            n = int(match.group(1))
+            name, artists, mix = fixtures.library_track(n)
+            track = fixtures.track_data(n, name, artists, mix, release_id=n // 12 + 1, image_host=self.url)
+            tracks.insert(rand.randint(0, len(tracks)), track)
+        return fixtures.search_page(tracks)
+
+    #Release page with all library tracks of release (one corpus folder)
+    def release_page(self, release_id: int) -> str:
+        tracks = []
+        for n in range((release_id - 1) * 12, release_id * 12):
+            name, artists, mix = fixtures.library_track(n)
+            tracks.append(fixtures.track_data(n, name, artists, mix, release_id=release_id, image_host=self.url))
+        return fixtures.search_page(tracks)
+
+#Serve in own process, so page generation doesn't compete with the benchmark for the GIL
+#Prints URL once ready, pages = directory with saved search pages
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages')
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    pages = None
+    if args.pages != None:
+        pages = []
+        for file in sorted(os.listdir(args.pages)):
+            with open(os.path.join(args.pages, file), 'r', encoding='utf-8') as f:
+                pages.append(f.read())
+    stub = StubServer(pages=pages, latency=args.latency).start()
+    print(stub.url, flush=True)
+    #Runs until stdin is closed
+    sys.stdin.read()
+    stub.stop()
+
+if __name__ == '__main__':
+    main()
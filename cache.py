@@ -0,0 +1,101 @@
+import json
+import time
+import threading
+
+import db
+from metrics import Metrics
+
+#Persistent cache of match results, keyed by normalized query
+class MatchCache:
+
+    #Incremented when key format changes, entries with older keys are dropped
+    VERSION = 2
+
+    def __init__(self, path: str, ttl = 30 * 24 * 60 * 60, max_entries = 500000, batch = 1000, metrics = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        #Access times of hits are written every batch hits
+        self.batch = batch
+        #Key: access time not written yet
+        self._accessed = {}
+        #Hits and misses are counted as match_cache_hits and match_cache_misses
+        self.metrics = metrics if metrics != None else Metrics()
+        self._lock = threading.Lock()
+        self._db = db.connect(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS matches (key TEXT PRIMARY KEY, track TEXT, created REAL, accessed REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS matches_accessed ON matches (accessed)')
+        if self._db.execute('PRAGMA user_version').fetchone()[0] < self.VERSION:
+            self._db.execute('DELETE FROM matches')
+            self._db.execute(f'PRAGMA user_version = {self.VERSION}')
+        self._db.commit()
+        self._count = self._db.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+
+    #Generate key from title without attributes, cleaned artists, fuzziness and search strategies
+    #("not found" is only valid for the same queries)
+    @staticmethod
+    def key(title: str, clean_artists: str, fuzziness: int, strategies: str, duration: int = None) -> str:
+        key = f'{fuzziness}\x00{strategies}\x00{title}\x00{clean_artists}'
+        #Duration (in seconds) only when it affected matching
+        if duration != None:
+            key += f'\x00{duration}'
+        return key
+
+    #Returns (hit, payload), payload is None for cached "not found"
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT track, created FROM matches WHERE key = ?', (key,)).fetchone()
+            if row == None or now - row[1] > self.ttl:
+                self.metrics.inc('match_cache_misses')
+                return False, None
+            self._accessed[key] = now
+            if len(self._accessed) >= self.batch:
+                self._flush()
+                self._db.commit()
+            self.metrics.inc('match_cache_hits')
+
+        if row[0] == None:
+            return True, None
+        return True, json.loads(row[0])
+
+    #Store payload (dict or None if no match)
+    def put(self, key: str, payload):
+        data = None
+        if payload != None:
+            data = json.dumps(payload, separators=(',', ':'))
+        now = time.time()
+        with self._lock:
+            existing = self._db.execute('SELECT 1 FROM matches WHERE key = ?', (key,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?)', (key, data, now, now))
+            if existing == None:
+                self._count += 1
+            if self._count > self.max_entries:
+                #Eviction needs current access times
+                self._flush()
+                self._evict(now)
+            self._db.commit()
+
+    #Remove expired entries and least recently used above limit
+    def _evict(self, now: float):
+        self._db.execute('DELETE FROM matches WHERE created < ?', (now - self.ttl,))
+        count = self._db.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+        #Evict 10% extra to not run eviction on every put
+        remove = count - int(self.max_entries * 0.9)
+        if remove > 0:
+            self._db.execute('DELETE FROM matches WHERE key IN (SELECT key FROM matches ORDER BY accessed LIMIT ?)', (remove,))
+        self._count = self._db.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+
+    def _flush(self):
+        self._db.executemany('UPDATE matches SET accessed = ? WHERE key = ?', [(t, k) for k, t in self._accessed.items()])
+        self._accessed = {}
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.commit()
+            self._db.close()
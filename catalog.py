@@ -0,0 +1,61 @@
+import json
+import zlib
+import time
+import threading
+
+import db
+import normalize
+
+#Local index of every track seen on Beatport, with inverted index on title & artist tokens
+class Catalog:
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = db.connect(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS tracks (id INTEGER PRIMARY KEY, data BLOB, seen REAL)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS tokens (token TEXT, track INTEGER, PRIMARY KEY (token, track)) WITHOUT ROWID')
+        self._db.commit()
+
+    @staticmethod
+    def _tokens(title: str, artists: list) -> set:
+        out = set(normalize.tokens(title))
+        for artist in artists:
+            out.update(normalize.tokens(artist))
+        return out
+
+    #Add track payloads (Track.serialize())
+    def add(self, tracks: list):
+        now = time.time()
+        rows = []
+        tokens = []
+        for track in tracks:
+            rows.append((track['id'], zlib.compress(json.dumps(track, separators=(',', ':')).encode('utf-8')), now))
+            for token in self._tokens(track['title'] or track['name'], [a['name'] for a in track['artists']]):
+                tokens.append((token, track['id']))
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO tracks VALUES (?, ?, ?)', rows)
+            self._db.executemany('INSERT OR IGNORE INTO tokens VALUES (?, ?)', tokens)
+            self._db.commit()
+
+    #Get payloads of tracks sharing most tokens with query
+    def candidates(self, title: str, artists: list, limit = 50) -> list:
+        tokens = list(self._tokens(title, artists))
+        if len(tokens) == 0:
+            return []
+        query = f'SELECT track FROM tokens WHERE token IN ({",".join("?" * len(tokens))}) GROUP BY track ORDER BY COUNT(*) DESC LIMIT ?'
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(query, tokens + [limit])]
+            if len(ids) == 0:
+                return []
+            rows = self._db.execute(f'SELECT id, data FROM tracks WHERE id IN ({",".join("?" * len(ids))})', ids).fetchall()
+        #Keep order by relevance
+        data = {id: blob for id, blob in rows}
+        return [json.loads(zlib.decompress(data[id])) for id in ids if id in data]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import threading
+
+import db
+
+#State of running tag_dir job (outcomes and matched tracks), so it can be resumed after crash
+class Checkpoint:
+
+    def __init__(self, path: str, batch = 100, interval = 5.0, on_flush = None):
+        #Written every batch records or interval seconds
+        self.batch = batch
+        self.interval = interval
+        #Called before writing, to save data the checkpoint depends on (manifest)
+        self.on_flush = on_flush
+        self._lock = threading.Lock()
+        self._pending = []
+        self._flushed = time.monotonic()
+        self._db = db.connect(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS job (key TEXT PRIMARY KEY, value TEXT)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, status TEXT, track TEXT) WITHOUT ROWID')
+        self._db.commit()
+
+    #Start new job, previous state is dropped
+    def start(self, root: str, config_hash: str):
+        with self._lock:
+            self._pending = []
+            self._db.execute('DELETE FROM job')
+            self._db.execute('DELETE FROM files')
+            self._db.executemany('INSERT INTO job VALUES (?, ?)', [('root', os.path.abspath(root)), ('config', config_hash), ('started', str(time.time()))])
+            self._db.commit()
+
+    #Checkpoint is of unfinished job on same dir with same config
+    def matches(self, root: str, config_hash: str) -> bool:
+        with self._lock:
+            job = dict(self._db.execute('SELECT key, value FROM job').fetchall())
+        return job.get('root') == os.path.abspath(root) and job.get('config') == config_hash
+
+    #Returns (status, track payload) or None if file wasn't processed
+    def get(self, path: str):
+        with self._lock:
+            row = self._db.execute('SELECT status, track FROM files WHERE path = ?', (path,)).fetchone()
+        if row == None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] != None else None
+
+    #Status: matched (with track payload), ok or failed
+    def put(self, path: str, status: str, track: dict = None):
+        data = json.dumps(track, separators=(',', ':')) if track != None else None
+        with self._lock:
+            self._pending.append((path, status, data))
+            if len(self._pending) >= self.batch or time.monotonic() - self._flushed >= self.interval:
+                self._flush()
+
+    def _flush(self):
+        if self.on_flush != None:
+            self.on_flush()
+        #Keep matched track when only status is updated
+        self._db.executemany('INSERT INTO files VALUES (?, ?, ?) ON CONFLICT(path) DO UPDATE SET status = excluded.status, track = COALESCE(excluded.track, files.track)', self._pending)
+        self._db.commit()
+        self._pending = []
+        self._flushed = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    #Job is done, nothing to resume
+    def finish(self):
+        with self._lock:
+            self._pending = []
+            self._db.execute('DELETE FROM job')
+            self._db.execute('DELETE FROM files')
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.close()
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import math
+import argparse
+import threading
+import multiprocessing
+
+from strategies import STRATEGIES
+
+#Headless entry point, no Flask or pywebview
+#Progress is printed to stdout as JSON lines
+#Exit code: 0 = all files tagged, 1 = some files failed, 2 = invalid arguments
+
+TAGS = ['title', 'artist', 'album', 'label', 'bpm', 'genre', 'date', 'key', 'other', 'publishdate']
+
+#Options in the format of UI /start request, overridden by --config file and then by flags given on command line
+DEFAULTS = {
+    'tags': ['genre'],
+    'replaceArt': False,
+    'artResolution': 500,
+    'artistSeparator': '; ',
+    'fuzziness': 80,
+    'overwrite': False,
+    'id3v23': False,
+    'processes': 1,
+    'incremental': True,
+    'artQuality': None,
+    'durationTolerance': None,
+    'strategies': None,
+    'releaseLookup': False
+}
+
+#Argument: option, arguments have no defaults so only given flags are applied
+OPTIONS = {
+    'tags': 'tags',
+    'replace_art': 'replaceArt',
+    'art_resolution': 'artResolution',
+    'artist_separator': 'artistSeparator',
+    'fuzziness': 'fuzziness',
+    'overwrite': 'overwrite',
+    'id3v23': 'id3v23',
+    'processes': 'processes',
+    'art_quality': 'artQuality',
+    'duration_tolerance': 'durationTolerance',
+    'strategies': 'strategies',
+    'release_lookup': 'releaseLookup'
+}
+
+def parse_args(argv: list):
+    parser = argparse.ArgumentParser(prog='beatporttagger', description='Tag audio files with metadata from Beatport')
+    parser.add_argument('path', help='directory with MP3, FLAC and AIFF files')
+    parser.add_argument('--tags', nargs='+', default=argparse.SUPPRESS, choices=TAGS, help='tags to update (default: genre)')
+    parser.add_argument('--replace-art', action='store_true', default=argparse.SUPPRESS, help='replace album art')
+    parser.add_argument('--art-resolution', type=int, default=argparse.SUPPRESS, help='(default: 500)')
+    parser.add_argument('--art-quality', type=int, default=argparse.SUPPRESS, help='re-encode album art to JPEG of this quality (needs Pillow)')
+    parser.add_argument('--artist-separator', default=argparse.SUPPRESS, help='(default: "; ")')
+    parser.add_argument('--fuzziness', type=int, default=argparse.SUPPRESS, help='strictness in %% (default: 80)')
+    parser.add_argument('--duration-tolerance', type=float, default=argparse.SUPPRESS, help='skip Beatport tracks whose length differs from the file by more seconds')
+    parser.add_argument('--strategies', nargs='+', default=argparse.SUPPRESS, choices=list(STRATEGIES), help='search queries to try until one matches (default: all, best first)')
+    parser.add_argument('--release-lookup', action='store_true', default=argparse.SUPPRESS, help='match files of a folder with the same album tag against the tracklist of the release found for the first one')
+    parser.add_argument('--overwrite', action='store_true', default=argparse.SUPPRESS, help='overwrite existing tags')
+    parser.add_argument('--id3v23', action='store_true', default=argparse.SUPPRESS, help='write ID3v2.3 instead of ID3v2.4')
+    parser.add_argument('--cache-dir', help='persistent cache dir (default: ~/.beatporttagger)')
+    parser.add_argument('--no-cache', action='store_true', help='disable persistent cache')
+    parser.add_argument('--no-incremental', action='store_true', help='tag files again even if unchanged since last run (cache is still used)')
+    parser.add_argument('--trace-log', help='write stage timings of every file to this JSON lines file')
+    parser.add_argument('--processes', type=int, default=argparse.SUPPRESS, help='worker processes, for large libraries on multi-core machines (default: 1)')
+    parser.add_argument('--resume', action='store_true', help='continue interrupted run on the same path with the same options')
+    parser.add_argument('--config', help='JSON file with options in the same format as the UI, flags given on command line take precedence')
+    return parser.parse_args(argv)
+
+#Options in the format of UI /start request
+def options(args) -> dict:
+    data = dict(DEFAULTS)
+    if args.config != None:
+        with open(args.config, 'r') as f:
+            data.update(json.load(f))
+    for arg, option in OPTIONS.items():
+        if hasattr(args, arg):
+            data[option] = getattr(args, arg)
+    if args.no_incremental:
+        data['incremental'] = False
+    if args.cache_dir != None:
+        data['cacheDir'] = args.cache_dir
+    if args.no_cache:
+        data['cacheDir'] = None
+    if args.trace_log != None:
+        data['traceLog'] = args.trace_log
+    return data
+
+class Progress:
+
+    def __init__(self, out = sys.stdout):
+        self.tagger = None
+        self._out = out
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict):
+        line = json.dumps(event)
+        with self._lock:
+            self._out.write(line + '\n')
+            self._out.flush()
+
+    def _file(self, path: str, status: str):
+        t = self.tagger
+        done = len(t.success) + len(t.fail)
+        self.emit({
+            'event': 'file',
+            'path': path,
+            'status': status,
+            'percent': math.floor(done / t.total * 100) if t.total > 0 else 100,
+            'success': len(t.success),
+            'failed': len(t.fail),
+            'skipped': len(t.skipped),
+            'total': t.total,
+            'scanning': t.scanning
+        })
+
+    def success(self, path: str):
+        self._file(path, 'ok')
+
+    def fail(self, path: str):
+        self._file(path, 'failed')
+
+def main(argv: list = None) -> int:
+    args = parse_args(argv if argv != None else sys.argv[1:])
+    if not os.path.isdir(args.path):
+        sys.stderr.write(f'Invalid path: {args.path}\n')
+        return 2
+
+    #Heavy imports only after arguments are valid
+    import tagger
+    try:
+        config = tagger.config_from_options(options(args))
+    except (KeyError, ValueError, OSError) as e:
+        sys.stderr.write(f'Invalid options: {str(e)}\n')
+        return 2
+
+    progress = Progress()
+    progress.tagger = tagger.TagUpdater(config, success_callback=progress.success, fail_callback=progress.fail)
+    progress.tagger.tag_dir(args.path, resume=args.resume)
+
+    t = progress.tagger
+    progress.emit({
+        'event': 'done',
+        'success': len(t.success),
+        'failed': len(t.fail),
+        'skipped': len(t.skipped),
+        'total': t.total
+    })
+    return 1 if len(t.fail) > 0 else 0
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,12 @@
+import os
+import sqlite3
+
+#Open sqlite database in cache dir, shared by threads (callers hold their own lock)
+#WAL lets worker processes read while another one writes
+def connect(path: str) -> sqlite3.Connection:
+    if os.path.dirname(path) != '':
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    return db
@@ -0,0 +1,57 @@
+import os
+import json
+import hashlib
+import threading
+
+import db
+
+#Fingerprints of successfully tagged files, to skip unchanged files on next run
+class Manifest:
+
+    def __init__(self, path: str, batch = 100):
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._pending = []
+        self._db = db.connect(path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, tag_hash TEXT, track INTEGER, config TEXT)')
+        self._db.commit()
+        #Loaded into memory for O(1) lookups
+        self._entries = {row[0]: (row[1], row[2], row[3]) for row in self._db.execute('SELECT path, size, mtime, config FROM files')}
+
+    @staticmethod
+    def tag_hash(title: str, artists: list) -> str:
+        return hashlib.sha1(json.dumps([title, artists]).encode('utf-8')).hexdigest()
+
+    #File was tagged with same config and not modified since
+    def unchanged(self, path: str, config_hash: str) -> bool:
+        entry = self._entries.get(path)
+        if entry == None or entry[2] != config_hash:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return entry[0] == stat.st_size and entry[1] == stat.st_mtime
+
+    #Record file after it was written
+    def put(self, path: str, tag_hash: str, track_id: int, config_hash: str):
+        stat = os.stat(path)
+        with self._lock:
+            self._entries[path] = (stat.st_size, stat.st_mtime, config_hash)
+            self._pending.append((path, stat.st_size, stat.st_mtime, tag_hash, track_id, config_hash))
+            if len(self._pending) >= self.batch:
+                self._flush()
+
+    def _flush(self):
+        self._db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)', self._pending)
+        self._db.commit()
+        self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.close()
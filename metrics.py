@@ -0,0 +1,98 @@
+import json
+import time
+import threading
+
+from contextlib import contextmanager
+
+PREFIX = 'beatporttagger'
+
+#Counters and per-stage timings, shared by all threads
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        #Stage name: [count, total seconds]
+        self.timings = {}
+        #Name: (function returning value, is counter)
+        self._gauges = {}
+
+    def inc(self, name: str, value = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            timing = self.timings.setdefault(stage, [0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    #Return counters and timings recorded since last call (for merging from worker processes)
+    def take(self) -> (dict, dict):
+        with self._lock:
+            counters, timings = self.counters, self.timings
+            self.counters, self.timings = {}, {}
+        return counters, timings
+
+    def merge(self, counters: dict, timings: dict):
+        with self._lock:
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for stage, (count, total) in timings.items():
+                timing = self.timings.setdefault(stage, [0, 0.0])
+                timing[0] += count
+                timing[1] += total
+
+    #Value read from fn when rendered, counter = value only grows
+    def gauge(self, name: str, fn, counter = False):
+        self._gauges[name] = (fn, counter)
+
+    #Prometheus text exposition format
+    def prometheus(self) -> str:
+        with self._lock:
+            counters = dict(self.counters)
+            timings = {k: list(v) for k, v in self.timings.items()}
+
+        lines = [f'# TYPE {PREFIX}_stage_seconds summary']
+        for stage, (count, total) in sorted(timings.items()):
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {count}')
+        for name, value in sorted(counters.items()):
+            lines.append(f'# TYPE {PREFIX}_{name}_total counter')
+            lines.append(f'{PREFIX}_{name}_total {value}')
+        for name, (fn, counter) in sorted(self._gauges.items()):
+            value = fn()
+            if value == None:
+                continue
+            if counter:
+                lines.append(f'# TYPE {PREFIX}_{name}_total counter')
+                lines.append(f'{PREFIX}_{name}_total {value}')
+            else:
+                lines.append(f'# TYPE {PREFIX}_{name} gauge')
+                lines.append(f'{PREFIX}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+#JSON lines log with stage timings of every tagged file
+class TraceLog:
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, entry: dict):
+        line = json.dumps(entry)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,58 @@
+import re
+
+from functools import lru_cache
+
+#Title & artist normalization used for matching
+#Patterns are compiled once and results are cached, because the same
+#Beatport titles and artists are cleaned many times per search
+
+CACHE_SIZE = 65536
+
+_SPECIAL = str.maketrans('', '', '.,()[] &_"' + "'")
+_ORIGINAL = re.compile(r'\(original( (mix|remix))*\)')
+_FEAT = re.compile(r'\(*feat[^\(\\[]*')
+_MIX_END = re.compile(r'(re)*mix$')
+
+def remove_special(input: str) -> str:
+    return input.translate(_SPECIAL).strip()
+
+def _clean_attributes(title: str) -> str:
+    title = _ORIGINAL.sub('', title.lower())
+    title = title.replace('(intro)', '').replace('(clean)', '')
+    return title.replace('  ', '').strip()
+
+#Remove track attributes like Original mix, intro clean
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_attributes(title: str) -> str:
+    return _clean_attributes(title)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_title(title: str) -> str:
+    title = _FEAT.sub('', title.lower())
+    title = _clean_attributes(title)
+    #Remove mid word the
+    title = title.replace('the ', '')
+    title = remove_special(title)
+    #Remove Remix/Mix from end
+    return _MIX_END.sub('', title).strip()
+
+#Title without attributes and featured artists, for broader search queries
+@lru_cache(maxsize=CACHE_SIZE)
+def search_title(title: str) -> str:
+    return _clean_attributes(_FEAT.sub('', title.lower()))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_artist(artist: str) -> str:
+    return remove_special(artist.lower())
+
+def clean_artists(artists: list) -> str:
+    return ''.join(sorted([clean_artist(a) for a in artists]))
+
+#Words too common to identify a track
+STOPWORDS = frozenset(['original', 'mix', 'remix', 'extended', 'edit', 'radio', 'version', 'dub', 'club', 'vocal', 'instrumental', 'feat', 'ft', 'the', 'and', 'of'])
+_WORD = re.compile(r'\w+')
+
+#Search tokens for title or artist
+@lru_cache(maxsize=CACHE_SIZE)
+def tokens(input: str) -> frozenset:
+    return frozenset(t for t in _WORD.findall(input.lower()) if len(t) > 1 and t not in STOPWORDS)
@@ -0,0 +1,294 @@
+import queue
+import asyncio
+import logging
+import threading
+
+from collections import OrderedDict
+
+#Marks end of input for worker
+_STOP = object()
+
+#Raise from stage function to run the item again after delay
+class Retry(Exception):
+
+    def __init__(self, delay: float):
+        super().__init__(f'Retry in {delay:.1f}s')
+        self.delay = delay
+
+#Pipeline stage with own worker pool and bounded input queue
+class Stage:
+
+    def __init__(self, name: str, fn, workers: int, queue_size: int = None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.next = None
+        self.on_error = None
+        self._queue = queue.Queue(queue_size or workers * 4)
+        self._threads = []
+        #Items queued, in progress or waiting for retry
+        self._pending = 0
+        self._idle = threading.Condition()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f'{self.name}-{i}')
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    #Blocks while the queue is full
+    def put(self, item):
+        with self._idle:
+            self._pending += 1
+        self._queue.put(item)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            try:
+                result = self.fn(item)
+            except Retry as r:
+                #Still pending, requeued after delay
+                timer = threading.Timer(r.delay, self._queue.put, (item,))
+                timer.daemon = True
+                timer.start()
+                continue
+            except Exception as e:
+                logging.error(f'Stage {self.name} failed: {str(e)}')
+                if self.on_error != None:
+                    self.on_error(item, e)
+                self._done()
+                continue
+            #None = item was handled, don't pass further
+            if result != None and self.next != None:
+                self.next.put(result)
+            self._done()
+
+    def _done(self):
+        with self._idle:
+            self._pending -= 1
+            self._idle.notify_all()
+
+    #Finish queued items (including retries) and stop workers
+    def close(self):
+        with self._idle:
+            while self._pending > 0:
+                self._idle.wait()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+#Stage running coroutines on own event loop thread, workers = concurrent tasks
+class AsyncStage:
+
+    def __init__(self, name: str, fn, workers: int, queue_size: int = None, on_close = None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.next = None
+        self.on_error = None
+        #Coroutine function called before the loop stops
+        self.on_close = on_close
+        self._slots = threading.BoundedSemaphore(queue_size or workers * 4)
+        self._ready = threading.Event()
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._pending = 0
+        self._idle = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._ready.set()
+        self._loop.run_until_complete(self._main())
+        self._loop.close()
+
+    async def _main(self):
+        await asyncio.gather(*[self._worker() for _ in range(self.workers)])
+        if self.on_close != None:
+            await self.on_close()
+
+    async def _worker(self):
+        while True:
+            item, slot = await self._queue.get()
+            if item is _STOP:
+                break
+            #Retried items don't hold a slot
+            if slot:
+                self._slots.release()
+            try:
+                result = await self.fn(item)
+            except Retry as r:
+                self._loop.call_later(r.delay, self._queue.put_nowait, (item, False))
+                continue
+            except Exception as e:
+                logging.error(f'Stage {self.name} failed: {str(e)}')
+                if self.on_error != None:
+                    self.on_error(item, e)
+                self._done()
+                continue
+            #Next stage can block, don't block the loop
+            if result != None and self.next != None:
+                await self._loop.run_in_executor(None, self.next.put, result)
+            self._done()
+
+    def _add(self, item):
+        self._pending += 1
+        self._idle.clear()
+        self._queue.put_nowait((item, True))
+
+    def _done(self):
+        self._pending -= 1
+        if self._pending == 0:
+            self._idle.set()
+
+    #Blocks while the queue is full
+    def put(self, item):
+        self._slots.acquire()
+        self._loop.call_soon_threadsafe(self._add, item)
+
+    async def _stop(self):
+        await self._idle.wait()
+        for _ in range(self.workers):
+            self._queue.put_nowait((_STOP, False))
+
+    #Finish queued items (including retries) and stop workers
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop)
+        self._thread.join()
+
+#Chain of stages, output of each stage is fed to the next one
+class Pipeline:
+
+    def __init__(self, stages: list, on_error = None):
+        self.stages = stages
+        for i, stage in enumerate(stages):
+            stage.on_error = on_error
+            if i + 1 < len(stages):
+                stage.next = stages[i + 1]
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def put(self, item):
+        self.stages[0].put(item)
+
+    #Stages are closed in order, so every item reaches the end
+    def close(self):
+        for stage in self.stages:
+            stage.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+#Bounds total size of data held by items in flight (e.g. cover art between stages)
+class ByteBudget:
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.used = 0
+        self._cond = threading.Condition()
+
+    #Blocks until size fits, returns reserved size to release later
+    def acquire(self, size: int) -> int:
+        #Item larger than the whole budget waits for everything else to finish
+        size = min(size, self.capacity)
+        with self._cond:
+            self._cond.wait_for(lambda: self.used + size <= self.capacity)
+            self.used += size
+        return size
+
+    def release(self, size: int):
+        with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+#Bounded map of recent results, least recently used entries are dropped
+class LRU:
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    #Returns (hit, value), value can be None
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return False, None
+            self._data.move_to_end(key)
+            return True, self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+#Concurrent calls with the same key share one execution
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        #Calls which waited for another one
+        self.shared = 0
+
+    #Run fn, or wait for result of the same call already in flight
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call == None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            self.shared += 1
+            call.done.wait()
+            if call.error != None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,133 @@
+import time
+import random
+import asyncio
+import threading
+
+from collections import deque
+
+#Token bucket limiting request rate, shared by all workers
+#Concurrency limit is adjusted AIMD style: +1 per window of fast successful requests,
+#halved on HTTP 429/5xx or connection errors, reduced when latency is over target
+class RateLimiter:
+
+    def __init__(self, rate = 20, burst = None, max_concurrency = 16, min_concurrency = 1, target_latency = 3.0):
+        #None = no rate limit, only concurrency
+        self.rate = rate
+        #At least one request, rate can be below 1/s (share of one worker process)
+        self.burst = burst or max(rate or 1, 1)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+        self.concurrency = max(min_concurrency, max_concurrency / 2)
+        self.in_flight = 0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._cond = threading.Condition()
+        #(loop, future) of tasks waiting for a request to finish, first one is woken by release
+        self._waiters = deque()
+        #A task is sleeping until tokens refill or pause ends
+        self._sleeping = False
+
+    def _refill(self, now: float):
+        if self.rate != None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    #Returns 0 if request can start, otherwise how long to wait (None = until a request finishes)
+    def _try_acquire(self):
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.in_flight >= int(self.concurrency):
+            return None
+        if self.rate != None:
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        self.in_flight += 1
+        return 0
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return
+                self._cond.wait(wait)
+
+    #Tasks wait in order, each one wakes the next after it starts, so waiting doesn't poll
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        queued, sleeping = False, False
+        while True:
+            with self._cond:
+                if sleeping:
+                    self._sleeping, sleeping = False, False
+                #New tasks don't overtake waiting ones
+                wait = self._try_acquire() if queued or len(self._waiters) == 0 else None
+                if wait == 0:
+                    self._wake_async()
+                    return
+                #Only one task sleeps until tokens refill, the others wait until it starts
+                if wait != None and self._sleeping:
+                    wait = None
+                if wait == None:
+                    future = loop.create_future()
+                    if queued:
+                        self._waiters.appendleft((loop, future))
+                    else:
+                        self._waiters.append((loop, future))
+                else:
+                    self._sleeping, sleeping = True, True
+            queued = True
+            try:
+                if wait == None:
+                    await future
+                else:
+                    await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                with self._cond:
+                    if sleeping:
+                        self._sleeping = False
+                    self._wake_async()
+                raise
+
+    #Wake first waiting task, lock has to be held
+    def _wake_async(self):
+        while len(self._waiters) > 0:
+            loop, future = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(self._resolve, future)
+                return
+            except RuntimeError:
+                #Loop is closed
+                continue
+
+    #Cancelled task passes the wakeup on
+    def _resolve(self, future):
+        if future.done():
+            with self._cond:
+                self._wake_async()
+        else:
+            future.set_result(None)
+
+    #Report finished request, status 0 = connection error
+    def release(self, latency: float, status: int, retry_after: float = None):
+        with self._cond:
+            self.in_flight -= 1
+            if status == 0 or status == 429 or status >= 500:
+                self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                if retry_after != None:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            elif latency > self.target_latency:
+                self.concurrency = max(self.min_concurrency, self.concurrency * 0.9)
+            else:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._cond.notify_all()
+            self._wake_async()
+
+#Exponential backoff with full jitter, attempt starts at 0
+def backoff(attempt: int, base = 1.0, max_delay = 60.0) -> float:
+    return random.uniform(0, min(max_delay, base * 2 ** attempt))
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+#Release matched for each group of files (same folder and album tag), so the other
+#files of a group can be matched against the release tracklist instead of searching.
+#The tracklist is only worth fetching when a second file of the group shows up, so
+#folders of unrelated singles don't cost extra requests. Files wait for the first
+#lookup of their group, until then no release is known
+class FolderReleases:
+
+    def __init__(self, timeout = 30.0):
+        #Max seconds to wait for first lookup
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        #Group: release (BPSmall), None = first file didn't match (yet)
+        self._releases = {}
+        #Group: Event set when first lookup is done
+        self._first = {}
+        #Releases whose tracklist couldn't be fetched
+        self._failed = set()
+        #Group: (loop, future) of tasks waiting for first lookup
+        self._waiters = {}
+
+    #Returns True if caller does the first lookup of group and has to call done()
+    def begin(self, group: tuple) -> bool:
+        with self._lock:
+            if group in self._first:
+                return False
+            self._first[group] = threading.Event()
+            return True
+
+    def done(self, group: tuple):
+        with self._lock:
+            self._first[group].set()
+            waiters = self._waiters.pop(group, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def wait(self, group: tuple) -> bool:
+        return self._first[group].wait(self.timeout)
+
+    #Same as wait, without blocking the event loop
+    async def wait_async(self, group: tuple) -> bool:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._first[group].is_set():
+                return True
+            future = loop.create_future()
+            self._waiters.setdefault(group, []).append((loop, future))
+        try:
+            await asyncio.wait_for(future, self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    #Release to match against, None if not known or its tracklist failed
+    def get(self, group: tuple):
+        with self._lock:
+            release = self._releases.get(group)
+            if release == None or release.id in self._failed:
+                return None
+            return release
+
+    #First matched release of group is kept
+    def add(self, group: tuple, release):
+        with self._lock:
+            if self._releases.get(group) == None:
+                self._releases[group] = release
+
+    def fail(self, release):
+        with self._lock:
+            self._failed.add(release.id)
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
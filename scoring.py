@@ -0,0 +1,66 @@
+import re
+
+from functools import lru_cache
+from collections import Counter
+from fuzzywuzzy import fuzz
+
+#Batch fuzzy scoring, returns the same scores as fuzzywuzzy's token_sort_ratio
+#Uses rapidfuzz (C) to score one query against all candidates in one call,
+#only if fuzzywuzzy is backed by python-Levenshtein, because the pure python
+#SequenceMatcher fallback gives slightly different ratios
+#Neither is in requirements, installing python-Levenshtein changes fuzzywuzzy's own
+#scores too, so it is left to the user (batch scoring is opt-in, see README)
+try:
+    from rapidfuzz import process
+    from rapidfuzz.distance import Indel
+    BATCH = fuzz.SequenceMatcher.__module__ == 'fuzzywuzzy.StringMatcher'
+except ImportError:
+    BATCH = False
+
+CACHE_SIZE = 65536
+
+#Same preprocessing as fuzzywuzzy with force_ascii
+_NOT_ASCII = dict.fromkeys(range(128, 256))
+_NON_WORD = re.compile(r'(?ui)\W')
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _process_and_sort(s: str) -> str:
+    s = _NON_WORD.sub(' ', s.translate(_NOT_ASCII)).lower().strip()
+    return ' '.join(sorted(s.split())).strip()
+
+#Same as fuzzywuzzy ratio from Indel distance
+def _ratio(s1: str, s2: str, distance: int) -> int:
+    if s1 == s2:
+        return 100
+    if len(s1) == 0 or len(s2) == 0:
+        return 0
+    lensum = len(s1) + len(s2)
+    return int(round(100 * ((lensum - distance) / lensum)))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _characters(s: str) -> Counter:
+    return Counter(_process_and_sort(s))
+
+#Upper bound of token_sort_ratio (before rounding) from shared characters alone,
+#common subsequence can't be longer than the characters both strings have
+def max_score(query: str, choice: str) -> float:
+    a, b = _characters(query), _characters(choice)
+    total = sum(a.values()) + sum(b.values())
+    if total == 0:
+        return 100
+    return 200 * sum((a & b).values()) / total
+
+#Score query against every choice, returns scores in order of choices
+#SequenceMatcher ratio isn't symmetric, query_first = query is the first argument of token_sort_ratio
+def token_sort_scores(query: str, choices: list, query_first: bool = False) -> list:
+    if not BATCH:
+        if query_first:
+            return [fuzz.token_sort_ratio(query, c) for c in choices]
+        return [fuzz.token_sort_ratio(c, query) for c in choices]
+
+    query = _process_and_sort(query)
+    processed = [_process_and_sort(c) for c in choices]
+    scores = [0] * len(processed)
+    for _, distance, i in process.extract(query, processed, scorer=Indel.distance, processor=None, limit=None):
+        scores[i] = _ratio(query, processed[i], distance)
+    return scores
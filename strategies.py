@@ -0,0 +1,91 @@
+import threading
+
+import db
+import normalize
+
+#Search queries, from most to least specific
+#Function of (title, artists, isrc) returns query or None if it can't be used
+STRATEGIES = {
+    'artists_title': lambda title, artists, isrc: ', '.join(artists) + f' {title}',
+    'first_artist': lambda title, artists, isrc: f'{artists[0]} {normalize.search_title(title)}' if len(artists) > 0 else None,
+    'title': lambda title, artists, isrc: normalize.search_title(title),
+    'isrc': lambda title, artists, isrc: isrc
+}
+
+#Strategies are tried until one finds a match, the ones with lowest
+#cost per match first. Hit rate and time of every strategy are kept
+#between runs if path is set
+class Strategies:
+
+    def __init__(self, path: str = None, names: list = None, batch = 100):
+        self.names = names if names != None else list(STRATEGIES)
+        self.batch = batch
+        self._lock = threading.Lock()
+        #Name: [attempts, hits, seconds]
+        self._totals = {}
+        #Not yet written to db
+        self._pending = {}
+        self._db = None
+        if path != None:
+            self._db = db.connect(path)
+            self._db.execute('CREATE TABLE IF NOT EXISTS strategies (name TEXT PRIMARY KEY, attempts INTEGER, hits INTEGER, seconds REAL)')
+            self._db.commit()
+            self._totals = {row[0]: list(row[1:]) for row in self._db.execute('SELECT name, attempts, hits, seconds FROM strategies')}
+
+    #Expected seconds per match, smoothed so strategies without stats are still tried
+    def _cost(self, name: str) -> float:
+        attempts, hits, seconds = self._totals.get(name, (0, 0, 0.0))
+        rate = (hits + 1) / (attempts + 2)
+        return (seconds + 1.0) / (attempts + 1) / rate
+
+    #Names of used strategies, for cache keys
+    def signature(self) -> str:
+        return ','.join(sorted(self.names))
+
+    #Returns [(name, query)] in order to try, without empty and repeated queries
+    def queries(self, title: str, artists: list, isrc: str = None) -> list:
+        with self._lock:
+            names = sorted(self.names, key=self._cost)
+        out = []
+        seen = set()
+        for name in names:
+            query = STRATEGIES[name](title, artists, isrc)
+            if query == None or query.strip() == '' or query.lower() in seen:
+                continue
+            seen.add(query.lower())
+            out.append((name, query))
+        return out
+
+    def record(self, name: str, hit: bool, seconds: float):
+        with self._lock:
+            for stats in (self._totals, self._pending):
+                entry = stats.setdefault(name, [0, 0, 0.0])
+                entry[0] += 1
+                entry[1] += 1 if hit else 0
+                entry[2] += seconds
+            if sum(e[0] for e in self._pending.values()) >= self.batch:
+                self._flush()
+
+    #Name: (attempts, hits, seconds)
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: tuple(entry) for name, entry in self._totals.items()}
+
+    #Only increments are written, so processes sharing the db don't overwrite each other
+    def _flush(self):
+        if self._db != None and len(self._pending) > 0:
+            self._db.executemany('INSERT INTO strategies VALUES (?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET attempts = attempts + excluded.attempts, hits = hits + excluded.hits, seconds = seconds + excluded.seconds',
+                [(name, *entry) for name, entry in self._pending.items()])
+            self._db.commit()
+        self._pending = {}
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self._db != None:
+                self._db.close()
+                self._db = None
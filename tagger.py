@@ -1,17 +1,31 @@
+import io
 import os
-import requests
-import logging
-import threading
 import copy
+import queue
+import logging
+import hashlib
+import json
 import time
 import sys
+import multiprocessing
 
 from enum import Enum
-from mutagen.id3 import ID3, TIT2, TPE1, TALB, TPUB, TBPM, TCON, TDAT, TYER, APIC, TKEY, TORY, TXXX, TDRC, TDRL
-from mutagen.flac import FLAC, Picture
-from mutagen.aiff import AIFF
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from mutagen.id3 import TIT2, TPE1, TALB, TPUB, TBPM, TCON, TDAT, TYER, TKEY, TORY, TXXX, TDRC, TDRL
 
 import beatport
+from cache import MatchCache
+from catalog import Catalog
+from manifest import Manifest
+from checkpoint import Checkpoint
+from strategies import Strategies
+from releases import FolderReleases
+from artcache import ArtCache
+from tags import ID3Session, FLACSession
+from pipeline import Stage, AsyncStage, Pipeline, Retry, ByteBudget, SingleFlight
+from ratelimit import RateLimiter, backoff
+from metrics import Metrics, TraceLog
 
 
 # Configure logging
@@ -28,7 +42,11 @@ UpdatableTags = Enum('UpdatableTags', 'title artist album label bpm genre date k
 
 class TagUpdaterConfig:
 
-    def __init__(self, update_tags = [UpdatableTags.genre], replace_art = False, artist_separator = ';', art_resolution = 1200, fuzziness = 80, overwrite = False, id3v23=False):
+    def __init__(self, update_tags = [UpdatableTags.genre], replace_art = False, artist_separator = ';', art_resolution = 1200, fuzziness = 80, overwrite = False, id3v23=False,
+        cache_dir = None, cache_ttl = 30 * 24 * 60 * 60, cache_size = 500000, threads = 16, art_threads = 4, read_threads = 2, write_threads = 2,
+        max_connections = 16, async_client = False, async_tasks = 256, catalog = True, incremental = True,
+        art_cache_size = 512 * 1024 * 1024, rate_limit = 20, retries = 3, trace_log = None, processes = 1, checkpoint = True,
+        art_max_bytes = 8 * 1024 * 1024, art_memory = 64 * 1024 * 1024, art_quality = None, duration_tolerance = None, strategies = None, release_lookup = False):
         self.update_tags = update_tags
         self.replace_art = replace_art
         self.artist_separator = artist_separator
@@ -36,129 +54,719 @@ class TagUpdaterConfig:
         self.fuzziness = fuzziness
         self.overwrite = overwrite,
         self.id3v23 = id3v23
+        #Directory for persistent data, None = disabled
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        #Worker counts for each pipeline stage, threads = matching
+        self.threads = threads
+        self.art_threads = art_threads
+        self.read_threads = read_threads
+        self.write_threads = write_threads
+        #HTTP connection pool size
+        self.max_connections = max_connections
+        #Match on asyncio event loop with async_tasks concurrent lookups instead of threads
+        self.async_client = async_client
+        self.async_tasks = async_tasks
+        #Match against local index of seen tracks before searching (needs cache_dir)
+        self.catalog = catalog
+        #Skip files tagged with same config and unchanged since (needs cache_dir)
+        self.incremental = incremental
+        #Max size of cover art cache in bytes (needs cache_dir)
+        self.art_cache_size = art_cache_size
+        #Max Beatport requests per second (None = unlimited), concurrency adapts up to max_connections
+        self.rate_limit = rate_limit
+        #Retries of lookups failed on network errors, HTTP 429 or 5xx
+        self.retries = retries
+        #Path of JSON lines file with stage timings of every file, None = disabled
+        self.trace_log = trace_log
+        #Worker processes, each with own pipeline and Beatport client, 1 = tag in this process
+        self.processes = processes
+        #Save progress of tag_dir, so it can be resumed (needs cache_dir)
+        self.checkpoint = checkpoint
+        #Larger cover downloads are skipped
+        self.art_max_bytes = art_max_bytes
+        #Max bytes of cover art held by files waiting to be written
+        self.art_memory = art_memory
+        #Re-encode covers to JPEG of this quality (and at most art_resolution), None = embed as downloaded (needs Pillow)
+        self.art_quality = art_quality
+        #Skip Beatport tracks whose length differs from the file by more seconds, None = length not checked
+        self.duration_tolerance = duration_tolerance
+        #Names of search strategies to try (strategies.STRATEGIES), None = all
+        self.strategies = strategies
+        #Match files of a folder with the same album tag against the tracklist of release matched for the first one, before searching
+        self.release_lookup = release_lookup
+
+    #Hash of options which affect written tags
+    def hash(self) -> str:
+        data = [sorted([t.name for t in self.update_tags]), self.replace_art, self.artist_separator, self.art_resolution, self.fuzziness, self.overwrite, self.id3v23]
+        #Only when set, so existing manifests stay valid
+        if self.art_quality != None:
+            data.append(self.art_quality)
+        if self.duration_tolerance != None:
+            data.append(['duration', self.duration_tolerance])
+        if self.strategies != None:
+            data.append(['strategies', self.strategies])
+        if self.release_lookup:
+            data.append('release_lookup')
+        return hashlib.sha1(json.dumps(data).encode('utf-8')).hexdigest()
+
+#Default persistent cache dir
+def cache_path() -> str:
+    return os.path.join(os.path.expanduser('~'), '.beatporttagger')
+
+AUDIO_EXTENSIONS = frozenset(['.mp3', '.flac', '.aiff', '.aif'])
+
+#Recursively yield audio files, directories are read lazily with scandir
+def scan(path: str):
+    dirs = [path]
+    while len(dirs) > 0:
+        try:
+            entries = os.scandir(dirs.pop())
+        except OSError as e:
+            logging.error(f'Error reading directory: {str(e)}')
+            continue
+        subdirs = []
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        #Like os.walk, links to directories aren't followed
+                        if not entry.is_symlink():
+                            subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                        yield entry.path
+                except OSError:
+                    continue
+        #Keep os.walk order
+        dirs.extend(reversed(subdirs))
+
+#Consecutive files (same folder = often same release) are kept in one chunk
+def _chunks(files, size: int = 50):
+    chunk = []
+    for file in files:
+        chunk.append(file)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+#Tagger of worker process in multi-process mode
+_worker = None
+#Outcomes of files of current chunk, returned with the chunk result,
+#because events still buffered in the queue can arrive after it
+_outcomes = []
+
+def _init_worker(config: TagUpdaterConfig, events):
+    global _worker
+    config = copy.copy(config)
+    #Every process has own rate limiter, limits are split so beatport.com gets the same load in total
+    if config.rate_limit != None:
+        config.rate_limit = config.rate_limit / config.processes
+    config.max_connections = max(1, config.max_connections // config.processes)
+    config.processes = 1
+    #Outcomes are recorded by parent
+    config.checkpoint = False
+    def report(status: str, file: str):
+        _outcomes.append((status, file))
+        events.put((status, file))
+    _worker = TagUpdater(config, success_callback=lambda f: report('ok', f), fail_callback=lambda f: report('fail', f))
+
+#Returns outcomes of files and metrics recorded while tagging the chunk
+#resumed = file: track payload of files matched before resumed job stopped
+def _tag_chunk(files: list, resumed: dict) -> (list, dict, dict):
+    _outcomes.clear()
+    _worker._resumed.update(resumed)
+    _worker._tag_files(files)
+    if _worker.manifest != None:
+        _worker.manifest.flush()
+    if _worker.beatport.cache != None:
+        _worker.beatport.cache.flush()
+    _worker.strategies.flush()
+    return (list(_outcomes), *_worker.metrics.take())
+
+#Create config from options in the format of UI /start request (also used by CLI)
+def config_from_options(data: dict) -> TagUpdaterConfig:
+    return TagUpdaterConfig(
+        update_tags = [UpdatableTags[t] for t in data['tags']],
+        replace_art=data['replaceArt'],
+        art_resolution=data['artResolution'],
+        artist_separator=data['artistSeparator'],
+        fuzziness=data['fuzziness'],
+        overwrite=data['overwrite'],
+        id3v23=data['id3v23'],
+        cache_dir=data.get('cacheDir', cache_path()),
+        trace_log=data.get('traceLog'),
+        processes=data.get('processes', 1),
+        incremental=data.get('incremental', True),
+        art_quality=data.get('artQuality'),
+        duration_tolerance=data.get('durationTolerance'),
+        strategies=data.get('strategies'),
+        release_lookup=data.get('releaseLookup', False)
+    )
+
+#File passing through tagging stages
+class TagJob:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file_type = None
+        #Opened tags.ID3Session or tags.FLACSession
+        self.session = None
+        self.title = None
+        self.artists = None
+        #Audio length in seconds, read only if used for matching
+        self.duration = None
+        self.isrc = None
+        #Album tag, read only for release lookup
+        self.album = None
+        self.track = None
+        self.art = None
+        #Bytes of art memory budget held
+        self.art_reserved = 0
+        #Failed lookups
+        self.attempts = 0
+        #Stage name: seconds
+        self.timings = {}
 
 class TagUpdater:
 
     def __init__(self, config: TagUpdaterConfig, success_callback=None, fail_callback=None):
         self.config = config
-        self.beatport = beatport.Beatport()
+        self.metrics = Metrics()
+        cache = self._create_cache()
+        catalog = self._create_catalog()
+        self.strategies = self._create_strategies()
+        self.releases = FolderReleases()
+        self.limiter = RateLimiter(rate=config.rate_limit, max_concurrency=config.max_connections)
+        self.beatport = beatport.Beatport(cache=cache, catalog=catalog, max_connections=config.max_connections, limiter=self.limiter, metrics=self.metrics, duration_tolerance=config.duration_tolerance, strategies=self.strategies)
+        self.async_beatport = None
+        if config.async_client:
+            self.async_beatport = beatport.AsyncBeatport(cache=cache, catalog=catalog, max_connections=config.max_connections, limiter=self.limiter, metrics=self.metrics, duration_tolerance=config.duration_tolerance, strategies=self.strategies)
+        self.manifest = self._create_manifest()
+        self.art_cache = self._create_art_cache()
+        self.art_budget = ByteBudget(config.art_memory)
+        #Tracks of the same release waiting for one cover download share it (without art cache)
+        self._art_flight = SingleFlight()
+        self.trace_log = TraceLog(config.trace_log) if config.trace_log != None else None
+        #After manifest, which it flushes
+        self.checkpoint = self._create_checkpoint()
+        self._register_gauges()
         self._success_callback = success_callback
         self._fail_callback = fail_callback
         self.success = []
         self.fail = []
+        self.skipped = []
         self.total = 0
-
-    #Mark file as succesfull
-    def _ok(self, path: str):
+        #Directory scan in progress, total is not final
+        self.scanning = False
+        #Track payloads of files matched before resumed job stopped
+        self._resumed = {}
+        #Outcomes are saved to checkpoint (only in tag_dir)
+        self._checkpointing = False
+
+    def _create_cache(self):
+        if self.config.cache_dir == None:
+            return None
+        return MatchCache(os.path.join(self.config.cache_dir, 'matches.db'), ttl=self.config.cache_ttl, max_entries=self.config.cache_size, metrics=self.metrics)
+
+    def _create_catalog(self):
+        if self.config.cache_dir == None or not self.config.catalog:
+            return None
+        return Catalog(os.path.join(self.config.cache_dir, 'catalog.db'))
+
+    #Strategy stats are kept in cache dir, so later runs start with the best ones
+    def _create_strategies(self):
+        path = os.path.join(self.config.cache_dir, 'strategies.db') if self.config.cache_dir != None else None
+        return Strategies(path, names=self.config.strategies)
+
+    def _create_manifest(self):
+        if self.config.cache_dir == None or not self.config.incremental:
+            return None
+        return Manifest(os.path.join(self.config.cache_dir, 'manifest.db'))
+
+    def _create_art_cache(self):
+        if self.config.cache_dir == None or self.config.art_cache_size <= 0:
+            return None
+        return ArtCache(os.path.join(self.config.cache_dir, 'art'), max_size=self.config.art_cache_size, metrics=self.metrics)
+
+    def _create_checkpoint(self):
+        if self.config.cache_dir == None or not self.config.checkpoint:
+            return None
+        return Checkpoint(os.path.join(self.config.cache_dir, 'checkpoint.db'), on_flush=self.manifest.flush if self.manifest != None else None)
+
+    def _register_gauges(self):
+        self.metrics.gauge('files', lambda: self.total)
+        self.metrics.gauge('files_success', lambda: len(self.success))
+        self.metrics.gauge('files_failed', lambda: len(self.fail))
+        self.metrics.gauge('files_skipped', lambda: len(self.skipped))
+        self.metrics.gauge('http_in_flight', lambda: self.limiter.in_flight)
+        self.metrics.gauge('http_concurrency_limit', lambda: self.limiter.concurrency)
+
+    #Mark file as succesfull, restored = outcome loaded from checkpoint
+    def _ok(self, path: str, restored: bool = False):
         self.success.append(path)
+        if self._checkpointing and not restored:
+            self.checkpoint.put(path, 'ok')
         if self._success_callback != None:
             self._success_callback(path)
 
-    def _fail(self, path: str):
+    def _fail(self, path: str, restored: bool = False):
         self.fail.append(path)
+        if self._checkpointing and not restored:
+            self.checkpoint.put(path, 'failed')
         if self._fail_callback != None:
             self._fail_callback(path)
 
-    def tag_dir(self, path: str):
+    #resume = continue checkpointed job on same dir with same config, processed files are not tagged again
+    def tag_dir(self, path: str, resume: bool = False):
         #Reset
         self.success = []
         self.fail = []
+        self.skipped = []
         self.total = 0
+        self.scanning = True
+        self._resumed = {}
+
+        if self.checkpoint != None:
+            if resume and not self.checkpoint.matches(path, self.config.hash()):
+                logging.warning('No checkpoint of this job to resume, starting from beginning')
+                resume = False
+            if not resume:
+                self.checkpoint.start(path, self.config.hash())
+            self._checkpointing = True
+        else:
+            resume = False
+
+        #Files are tagged while the scan is still running, total grows as files are found
+        files = self._pending_files(path, resume)
+        if self.config.processes > 1:
+            self._tag_processes(files)
+        else:
+            self._tag_files(files)
+
+        if self.manifest != None:
+            self.manifest.flush()
+        if self.beatport.cache != None:
+            self.beatport.cache.flush()
+        self.strategies.flush()
+        if self.checkpoint != None:
+            self._checkpointing = False
+            self.checkpoint.finish()
+        #Counters include lookups of worker processes
+        counters = self.metrics.counters
+        logging.info(f'Coalesced lookups: {counters.get("coalesced_lookups", 0)}')
+        if self.beatport.cache != None:
+            logging.info(f'Match cache hits: {counters.get("match_cache_hits", 0)}, misses: {counters.get("match_cache_misses", 0)}')
+        if self.art_cache != None:
+            logging.info(f'Art cache hits: {counters.get("art_cache_hits", 0)}, misses: {counters.get("art_cache_misses", 0)}')
+
+    #Scanned files which need tagging, unchanged ones are skipped
+    def _pending_files(self, path: str, resume: bool = False):
+        config_hash = self.config.hash()
+        for file in scan(path):
+            if resume:
+                state = self.checkpoint.get(file)
+                if state != None:
+                    status, track = state
+                    #Matched, but not written yet
+                    if status == 'matched':
+                        self._resumed[file] = track
+                    else:
+                        self.total += 1
+                        if status == 'ok':
+                            self._ok(file, restored=True)
+                        else:
+                            self._fail(file, restored=True)
+                        continue
+            if self.manifest != None and self.manifest.unchanged(file, config_hash):
+                self.skipped.append(file)
+                continue
+            self.total += 1
+            yield file
+        self.scanning = False
+        if len(self.skipped) > 0:
+            logging.info(f'Skipping {len(self.skipped)} unchanged files')
+
+    def _tag_files(self, files):
+        #Stages run in separately sized pools, so disk and network don't block each other
+        stages = [
+            Stage('read', self._timed('read', self._read), self.config.read_threads),
+            self._match_stage(),
+            Stage('art', self._timed('art', self._fetch_art), self.config.art_threads),
+            Stage('write', self._timed('write', self._write), self.config.write_threads)
+        ]
+        with Pipeline(stages, on_error=self._stage_error) as pipeline:
+            for file in files:
+                job = TagJob(file)
+                track = self._resumed.pop(file, None)
+                if track != None:
+                    job.track = beatport.Track(track)
+                pipeline.put(job)
+
+    #Shard files across worker processes, progress is reported back through queue
+    def _tag_processes(self, files):
+        #Spawn, forking with running threads isn't safe
+        context = multiprocessing.get_context('spawn')
+        events = context.Queue()
+        chunks = _chunks(files)
+        reported = set()
+        #Future: files of chunk
+        running = {}
+        pool = None
+        try:
+            while chunks != None or len(running) > 0:
+                if pool == None:
+                    pool = ProcessPoolExecutor(self.config.processes, mp_context=context, initializer=_init_worker, initargs=(self.config, events))
+                #Chunks are read from the scan lazily, one per process, so a dying worker only loses the running ones
+                while chunks != None and len(running) < self.config.processes:
+                    chunk = next(chunks, None)
+                    if chunk == None:
+                        chunks = None
+                        break
+                    resumed = {f: self._resumed.pop(f) for f in chunk if f in self._resumed}
+                    running[pool.submit(_tag_chunk, chunk, resumed)] = chunk
+                self._worker_events(events, reported, timeout=0.05)
+                broken = False
+                for future in [f for f in running if f.done()]:
+                    broken = self._chunk_done(future, running.pop(future), events, reported) or broken
+                #Every chunk of broken pool fails, continue with new processes
+                if broken:
+                    wait(running)
+                    for future in list(running):
+                        self._chunk_done(future, running.pop(future), events, reported)
+                    pool.shutdown()
+                    pool = None
+        finally:
+            if pool != None:
+                pool.shutdown()
+
+    #Report outcomes of finished chunk, returns True if its worker process died
+    def _chunk_done(self, future, files: list, events, reported: set) -> bool:
+        try:
+            outcomes, counters, timings = future.result()
+        except Exception as e:
+            logging.error(f'Worker process failed: {str(e)}')
+            #Files reported before the failure are kept, the rest failed
+            self._worker_events(events, reported)
+            for file in files:
+                self._worker_outcome('fail', file, reported)
+            return isinstance(e, BrokenProcessPool)
+        self.metrics.merge(counters, timings)
+        for status, file in outcomes:
+            self._worker_outcome(status, file, reported)
+        return False
+
+    #Report files tagged by workers, waits up to timeout for the first one
+    def _worker_events(self, events, reported: set, timeout: float = None):
+        try:
+            status, file = events.get(timeout=timeout) if timeout != None else events.get_nowait()
+            while True:
+                self._worker_outcome(status, file, reported)
+                status, file = events.get_nowait()
+        except queue.Empty:
+            pass
+
+    #Outcome can come both from queue and chunk result
+    def _worker_outcome(self, status: str, file: str, reported: set):
+        if file in reported:
+            return
+        reported.add(file)
+        if status == 'ok':
+            self._ok(file)
+        else:
+            self._fail(file)
+
+    def _match_stage(self):
+        if self.async_beatport != None:
+            return AsyncStage('match', self._timed_async('match', self._match_async), self.config.async_tasks, on_close=self.async_beatport.close)
+        return Stage('match', self._timed('match', self._match), self.config.threads)
+
+    #Record duration of stage function, file is finished when it returns None
+    def _timed(self, stage: str, fn):
+        def run(job):
+            start = time.perf_counter()
+            try:
+                result = fn(job)
+            except Retry:
+                self._record(job, stage, start)
+                raise
+            except Exception as e:
+                self._record(job, stage, start)
+                self._trace(job, 'error', e)
+                raise
+            self._record(job, stage, start)
+            if result == None:
+                self._trace(job, 'ok' if stage == 'write' else 'failed')
+            return result
+        return run
+
+    def _timed_async(self, stage: str, fn):
+        async def run(job):
+            start = time.perf_counter()
+            try:
+                result = await fn(job)
+            except Retry:
+                self._record(job, stage, start)
+                raise
+            except Exception as e:
+                self._record(job, stage, start)
+                self._trace(job, 'error', e)
+                raise
+            self._record(job, stage, start)
+            if result == None:
+                self._trace(job, 'failed')
+            return result
+        return run
+
+    def _record(self, job, stage: str, start: float):
+        duration = time.perf_counter() - start
+        job.timings[stage] = job.timings.get(stage, 0) + duration
+        self.metrics.observe(stage, duration)
+
+    def _trace(self, job, status: str, error: Exception = None):
+        if self.trace_log == None:
+            return
+        self.trace_log.write({
+            'path': job.path,
+            'status': status,
+            'track': job.track.id if job.track != None else None,
+            'attempts': job.attempts,
+            'timings': job.timings,
+            'error': str(error) if error != None else None
+        })
+
+    #Unexpected error in pipeline stage
+    def _stage_error(self, job, e: Exception):
+        logging.error(f'Tagging failed: {job.path}, {str(e)}')
+        self._release_art(job)
+        self._fail(job.path)
 
-        extensions = ['.mp3', 'flac', 'aiff', '.aif']
-
-        #Get files
-        files = []
-        for root, _, f in os.walk(path):
-            for file in f:
-                if file.lower()[-4:] in extensions:
-                    files.append(os.path.join(root, file))
-        self.total = len(files)
-
-        #Threads
-        threads = []
-        available = copy.deepcopy(files)
-        while len(available) > 0 or len(threads) > 0:
-            #Create new threads
-            while len(threads) < 16 and len(available) > 0:
-                t = threading.Thread(target=self.tag_file, args=(available[0],))
-                t.daemon = True
-                t.start()
-                threads.append(t)
-                available.pop(0)
-
-            #Remove done
-            for i in range(0, len(threads)):
-                #Out of bounds
-                if i >= len(threads):
-                    break
-                if not threads[i].is_alive():
-                    threads.pop(i)
-                    
-            #Prevent infinite loop
-            time.sleep(0.005)
-            
-            
     def tag_file(self, file):
-        title, artists = None, None
-        file_type = None
+        job = TagJob(file)
+        stages = [self._timed('read', self._read), self._timed('match', self._match), self._timed('art', self._fetch_art), self._timed('write', self._write)]
+        for stage in stages:
+            while True:
+                try:
+                    result = stage(job)
+                    break
+                except Retry as r:
+                    time.sleep(r.delay)
+                except Exception:
+                    self._release_art(job)
+                    raise
+            if result == None:
+                return
+            job = result
+
+    #Read title and artists
+    def _read(self, job):
+        file = job.path
         try:
             #MP3 Files
             if file.lower().endswith('.mp3'):
-                title, artists = self.info_id3(file)
-                file_type = 'mp3'
+                job.session = ID3Session(file, self.config.id3v23)
+                job.title, job.artists = self.info_id3(file, job.session)
+                job.file_type = 'mp3'
             #FLAC
             if file.lower().endswith('.flac'):
-                title, artists = self.info_flac(file)
-                file_type = 'flac'
+                job.session = FLACSession(file)
+                job.title, job.artists = self.info_flac(file, job.session)
+                job.file_type = 'flac'
             #AIFF
             if file.lower().endswith('.aiff') or file.lower().endswith('.aif'):
-                title, artists = self.info_id3(file)
-                file_type = 'aiff'
+                job.session = ID3Session(file, self.config.id3v23)
+                job.title, job.artists = self.info_id3(file, job.session)
+                job.file_type = 'aiff'
     
         except Exception as e:
             logging.error('Invalid file: ' + file)
             self._fail(file)
             return
 
-        if title == None or artists == None:
+        if job.title == None or job.artists == None:
             self._fail(file)
             logging.error('No metadata in file: ' + file)
             return
-
-        logging.info('Processing file: ' + file)
-        #Search
-        track = None
+        if self.config.duration_tolerance != None:
+            job.duration = job.session.length()
+        job.isrc = job.session.isrc()
+        if self.config.release_lookup:
+            job.album = job.session.album()
+        return job
+
+    #Search on Beatport
+    def _match(self, job):
+        #Matched before job was resumed
+        if job.track != None:
+            return job
+        logging.info('Processing file: ' + job.path)
+        group = self._release_group(job)
+        first = group != None and self.releases.begin(group)
         try:
-            track = self.beatport.match_track(title, artists, fuzzywuzzy_ratio=self.config.fuzziness)
+            releases = None
+            if group != None and not first:
+                self.releases.wait(group)
+                releases = self._release_tracklist(group)
+            job.track = self.beatport.match_track(job.title, job.artists, fuzzywuzzy_ratio=self.config.fuzziness, duration=job.duration, isrc=job.isrc, releases=releases)
+            if group != None and job.track != None:
+                self.releases.add(group, job.track.album)
         except Exception as e:
-            logging.error(f'Matching failed: {file}, {str(e)}')
-            self._fail(file)
-            return
+            return self._match_failed(job, e)
+        finally:
+            if first:
+                self.releases.done(group)
+        return self._matched(job)
+
+    async def _match_async(self, job):
+        if job.track != None:
+            return job
+        logging.info('Processing file: ' + job.path)
+        group = self._release_group(job)
+        first = group != None and self.releases.begin(group)
+        try:
+            releases = None
+            if group != None and not first:
+                await self.releases.wait_async(group)
+                releases = await self._release_tracklist_async(group)
+            job.track = await self.async_beatport.match_track(job.title, job.artists, fuzzywuzzy_ratio=self.config.fuzziness, duration=job.duration, isrc=job.isrc, releases=releases)
+            if group != None and job.track != None:
+                self.releases.add(group, job.track.album)
+        except Exception as e:
+            return self._match_failed(job, e)
+        finally:
+            if first:
+                self.releases.done(group)
+        return self._matched(job)
+
+    #Release lookup groups files of a folder with the same album tag, None = file is searched alone
+    def _release_group(self, job):
+        if not self.config.release_lookup or not job.album:
+            return None
+        return (os.path.dirname(job.path), job.album.strip().lower())
+
+    #Fetch tracklist of release matched in group (once, by its second file), returns release ids to match against
+    def _release_tracklist(self, group: tuple):
+        release = self.releases.get(group)
+        if release == None:
+            return None
+        try:
+            self.beatport.release_tracks(release)
+        except Exception as e:
+            return self._release_failed(release, e)
+        return [release.id]
 
-        if track == None:
-            logging.error('Track not found on Beatport! ' + file)
-            self._fail(file)
+    async def _release_tracklist_async(self, group: tuple):
+        release = self.releases.get(group)
+        if release == None:
+            return None
+        try:
+            await self.async_beatport.release_tracks(release)
+        except Exception as e:
+            return self._release_failed(release, e)
+        return [release.id]
+
+    def _release_failed(self, release, e: Exception):
+        logging.warning(f'Release tracklist failed: {release.url("release")}, {str(e)}')
+        self.releases.fail(release)
+
+    def _match_failed(self, job, e: Exception):
+        #Temporary error, retry later
+        if isinstance(e, beatport.RequestError) and e.temporary() and job.attempts < self.config.retries:
+            delay = backoff(job.attempts)
+            job.attempts += 1
+            self.metrics.inc('retries')
+            logging.warning(f'Matching failed: {job.path}, {str(e)}, retrying in {delay:.1f}s')
+            raise Retry(delay)
+        logging.error(f'Matching failed: {job.path}, {str(e)}')
+        self._fail(job.path)
+
+    def _matched(self, job):
+        if job.track == None:
+            logging.error('Track not found on Beatport! ' + job.path)
+            self._fail(job.path)
             return
+        if self._checkpointing:
+            self.checkpoint.put(job.path, 'matched', job.track.serialize())
+        return job
 
-        #Update files
-        if file_type == 'mp3' or file_type == 'aiff':
-            self.update_id3(file, track)
-        if file_type == 'flac':
-            self.update_flac(file, track)
-        self._ok(file)
-
-
-
-    def update_id3(self, path: str, track: beatport.Track):
-        #AIFF Check
-        aiff = None
-        if path.endswith('.aiff') or path.endswith('.aif'):
-            aiff = AIFF(path)
-            f = aiff.tags
-        else:
-            f = ID3()
-            f.load(path, v2_version=3, translate=True)
+    #Download cover, blocks while art being downloaded or waiting to be written is over budget
+    def _fetch_art(self, job):
+        if self.config.replace_art:
+            #Largest possible cover is reserved before downloading, then only its actual size is kept
+            job.art_reserved = self.art_budget.acquire(self._art_reservation())
+            try:
+                job.art = self._get_art(job.track.art(self.config.art_resolution))
+            except Exception as e:
+                logging.warning(f'Error downloading cover for file: {job.path}, {str(e)}')
+            size = min(len(job.art), job.art_reserved) if job.art != None else 0
+            self.art_budget.release(job.art_reserved - size)
+            job.art_reserved = size
+        return job
+
+    #Bytes held while cover is downloaded and processed
+    def _art_reservation(self) -> int:
+        size = self.config.art_max_bytes or self.art_budget.capacity
+        #Decoded bitmap while re-encoding
+        if self.config.art_quality != None:
+            size += int(self.config.art_resolution) ** 2 * 4
+        return size
+
+    def _release_art(self, job):
+        job.art = None
+        if job.art_reserved > 0:
+            self.art_budget.release(job.art_reserved)
+            job.art_reserved = 0
+
+    #Cover is downloaded and processed once, then shared by all tracks of the release
+    def _get_art(self, url: str) -> bytes:
+        key = url if self.config.art_quality == None else f'{url}#jpeg{self.config.art_quality}'
+        fetch = lambda _: self._process_art(self.beatport.download(url, max_bytes=self.config.art_max_bytes))
+        #Art cache shares concurrent downloads itself
+        if self.art_cache != None:
+            return self.art_cache.get(key, fetch)
+        return self._art_flight.do(key, lambda: fetch(url))
+
+    #Re-encode to smaller JPEG, original is kept if Pillow is missing or result isn't smaller
+    def _process_art(self, data: bytes) -> bytes:
+        if self.config.art_quality == None:
+            return data
+        try:
+            from PIL import Image
+        except ImportError:
+            logging.warning('Pillow is not installed, cover art is not re-encoded')
+            return data
+        try:
+            with self.metrics.time('art_encode'):
+                image = Image.open(io.BytesIO(data))
+                size = int(self.config.art_resolution)
+                if image.width > size or image.height > size:
+                    image.thumbnail((size, size))
+                out = io.BytesIO()
+                image.convert('RGB').save(out, 'JPEG', quality=self.config.art_quality, optimize=True)
+        except Exception as e:
+            logging.warning(f'Error re-encoding cover art: {str(e)}')
+            return data
+        if out.tell() >= len(data):
+            return data
+        return out.getvalue()
+
+    #Update files
+    def _write(self, job):
+        if job.file_type == 'mp3' or job.file_type == 'aiff':
+            self.update_id3(job.path, job.track, art=job.art, session=job.session)
+        if job.file_type == 'flac':
+            self.update_flac(job.path, job.track, art=job.art, session=job.session)
+        job.session = None
+        self._release_art(job)
+        if self.manifest != None:
+            self.manifest.put(job.path, Manifest.tag_hash(job.title, job.artists), job.track.id, self.config.hash())
+        self._ok(job.path)
+
+    #Session is opened if not passed from reading
+    def update_id3(self, path: str, track: beatport.Track, art: bytes = None, session: ID3Session = None):
+        f = session or ID3Session(path, self.config.id3v23)
         
         #Update tags
         if UpdatableTags.title in self.config.update_tags and self.config.overwrite:
@@ -203,34 +811,14 @@ class TagUpdater:
             f.add(TXXX(desc='WWWAUDIOFILE', text=track.url()))
             f.add(TXXX(desc='WWWPUBLISHER', text=track.label.url('label')))
 
-        #Redownlaod cover
-        if self.config.replace_art:
-            try:
-                url = track.art(self.config.art_resolution)
-                r = requests.get(url)
-                data = APIC(
-                    encoding = 3,
-                    mime = 'image/jpeg',
-                    type = 3,
-                    desc = u'Cover',
-                    data = r.content
-                )
-                f.delall('APIC')
-                f['APIC:cover.jpg'] = data
-
-            except Exception:
-                logging.warning('Error downloading cover for file: ' + path)
-
-        if aiff == None:
-            if self.config.id3v23:
-                f.save(path, v2_version=3, v1=0)
-            else:
-                f.save(path, v2_version=4, v1=0)
-        else:
-            aiff.save()
+        #Replace cover
+        if art != None:
+            f.set_art(art)
 
-    def update_flac(self, path: str, track: beatport.Track):
-        f = FLAC(path)
+        f.save()
+
+    def update_flac(self, path: str, track: beatport.Track, art: bytes = None, session: FLACSession = None):
+        f = session or FLACSession(path)
 
         if UpdatableTags.title in self.config.update_tags and self.config.overwrite:
             f['TITLE'] = track.title
@@ -256,37 +844,21 @@ class TagUpdater:
             f['WWWAUDIOFILE'] = track.url()
             f['WWWPUBLISHER'] = track.label.url('label')
 
-        #Redownlaod cover
-        if self.config.replace_art:
-            try:
-                url = track.art(self.config.art_resolution)
-                r = requests.get(url)
-                image = Picture()
-                image.type = 3
-                image.mime = 'image/jpeg'
-                image.desc = 'Cover'
-                image.data = r.content
-                f.clear_pictures()
-                f.add_picture(image)
-            except Exception:
-                logging.warning('Error downloading cover for file: ' + path)
+        #Replace cover
+        if art != None:
+            f.set_art(art)
 
         f.save()
 
     #Info returns title and artists aray
-    def info_id3(self, path: str) -> (str, list):
-        #AIFF
-        if path.endswith('.aiff') or path.endswith('.aif'):
-            f = AIFF(path).tags
-        else:
-            f = ID3(path)
-
+    def info_id3(self, path: str, session: ID3Session = None) -> (str, list):
+        f = session or ID3Session(path, self.config.id3v23)
         title = str(f['TIT2'])
         artists = self._parse_artists(str(f['TPE1']))
         return title, artists
 
-    def info_flac(self, path: str) -> (str, list):
-        f = FLAC(path)
+    def info_flac(self, path: str, session: FLACSession = None) -> (str, list):
+        f = session or FLACSession(path)
         title = str(f['title'][0])
         if len(f['artist']) > 1:
             artists = f['artist']
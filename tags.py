@@ -0,0 +1,147 @@
+from mutagen.id3 import ID3, APIC
+from mutagen.flac import FLAC, Picture
+from mutagen.aiff import AIFF
+from mutagen.mp3 import MPEGInfo
+
+#Audio files are opened once, parsed tags are kept between reading and
+#writing, and saved only if some value actually changed
+
+#MP3 & AIFF
+class ID3Session:
+
+    #Tags are loaded as the version they will be saved as, so unchanged frames compare equal
+    def __init__(self, path: str, id3v23 = False):
+        self.path = path
+        self.id3v23 = id3v23
+        self.changed = False
+        self._aiff = None
+        if path.lower().endswith('.aiff') or path.lower().endswith('.aif'):
+            self._aiff = AIFF(path)
+            self.tags = self._aiff.tags
+            if id3v23 and self.tags != None:
+                self.tags.update_to_v23()
+        else:
+            self.tags = ID3()
+            self.tags.load(path, v2_version=3 if id3v23 else 4, translate=True)
+        #Convert to requested version even if no frame changed
+        if self.tags != None and self.tags.version[1] != (3 if id3v23 else 4):
+            self.changed = True
+
+    def __getitem__(self, key):
+        return self.tags[key]
+
+    #Audio length in seconds, None if unknown
+    def length(self):
+        try:
+            if self._aiff != None:
+                return self._aiff.info.length
+            with open(self.path, 'rb') as f:
+                return MPEGInfo(f, self.tags.size if self.tags != None else 0).length
+        except Exception:
+            return None
+
+    #ISRC from TSRC frame, None if not set
+    def isrc(self):
+        if self.tags == None or len(self.tags.getall('TSRC')) == 0:
+            return None
+        return str(self.tags.getall('TSRC')[0]).strip() or None
+
+    def album(self):
+        if self.tags == None or len(self.tags.getall('TALB')) == 0:
+            return None
+        return str(self.tags.getall('TALB')[0]).strip() or None
+
+    def getall(self, key: str) -> list:
+        return self.tags.getall(key)
+
+    def setall(self, key: str, frames: list):
+        if self.tags.getall(key) != frames:
+            self.tags.setall(key, frames)
+            self.changed = True
+
+    def add(self, frame):
+        if self.tags.getall(frame.HashKey) != [frame]:
+            self.tags.add(frame)
+            self.changed = True
+
+    #Replace all pictures with front cover
+    def set_art(self, data: bytes):
+        current = self.tags.getall('APIC')
+        if len(current) == 1 and current[0].type == 3 and current[0].data == data:
+            return
+        self.tags.delall('APIC')
+        self.tags['APIC:cover.jpg'] = APIC(
+            encoding = 3,
+            mime = 'image/jpeg',
+            type = 3,
+            desc = u'Cover',
+            data = data
+        )
+        self.changed = True
+
+    #Returns if file was written
+    def save(self) -> bool:
+        if not self.changed:
+            return False
+        if self._aiff != None:
+            self._aiff.save(v2_version=3 if self.id3v23 else 4)
+        elif self.id3v23:
+            self.tags.save(self.path, v2_version=3, v1=0)
+        else:
+            self.tags.save(self.path, v2_version=4, v1=0)
+        self.changed = False
+        return True
+
+class FLACSession:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.changed = False
+        self.file = FLAC(path)
+
+    def __getitem__(self, key):
+        return self.file[key]
+
+    def length(self):
+        return self.file.info.length if self.file.info != None else None
+
+    def isrc(self):
+        values = self.file.get('isrc')
+        if values == None or len(values) == 0:
+            return None
+        return values[0].strip() or None
+
+    def album(self):
+        values = self.file.get('album')
+        if values == None or len(values) == 0:
+            return None
+        return values[0].strip() or None
+
+    def get(self, key: str):
+        return self.file.get(key)
+
+    def __setitem__(self, key: str, value: str):
+        if self.file.get(key) != [value]:
+            self.file[key] = value
+            self.changed = True
+
+    #Replace all pictures with front cover
+    def set_art(self, data: bytes):
+        current = self.file.pictures
+        if len(current) == 1 and current[0].type == 3 and current[0].data == data:
+            return
+        image = Picture()
+        image.type = 3
+        image.mime = 'image/jpeg'
+        image.desc = 'Cover'
+        image.data = data
+        self.file.clear_pictures()
+        self.file.add_picture(image)
+        self.changed = True
+
+    def save(self) -> bool:
+        if not self.changed:
+            return False
+        self.file.save()
+        self.changed = False
+        return True